@@ -1,47 +1,96 @@
+import time
+STARTED = time.perf_counter()  # Taken before the imports below, for the startup timing
 import sys
 import os
-import datetime
-import keyboard
-import pyautogui
-from PIL import Image
-from docx import Document
-from docx.shared import Inches
-from docx2pdf import convert
+import threading
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit, QPushButton, QTextEdit,
     QVBoxLayout, QHBoxLayout, QFileDialog, QCheckBox, QSpinBox, QGroupBox,
-    QMessageBox, QComboBox, QListWidget, QListWidgetItem
+    QMessageBox, QComboBox, QListWidget, QListWidgetItem, QDoubleSpinBox, QListView, QInputDialog,
+    QRubberBand
 )
-from PyQt5.QtGui import QPixmap, QScreen
-from PyQt5.QtCore import Qt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.shared import Pt
-import openpyxl
-from openpyxl.drawing.image import Image as ExcelImage
+from PyQt5.QtGui import QPixmap, QScreen, QImage, QIcon, QPainter, QColor
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QSize, QRect
 import logging  # Import the logging module
+from capture_pipeline import CapturePipeline
+from capture_regions import MIN_SIZE, RegionStore, active_window, region_target, window_target
+from capture_backends import BACKENDS, select_backend
+from capture_session import (CaptureSession, SessionSettings, all_monitors_target, monitor_targets,
+                             recover_session)
+from image_encoder import EncodeSettings
+from monitor_layout import MonitorTopology
+from metrics import REGISTRY, export_metrics, observe, setup_logging, span
+from frame_dedupe import DuplicateDetector
+from pdf_export import PdfJob, PdfService
+from preview_cache import PREVIEW_SIZE, STRIP_SIZE
+from session_journal import discard_journal, read_journal, unfinished_journals
 
 
 class ScreenshotApp(QWidget):
+    # Emitted from the pipeline's assembler thread; handled on the GUI thread
+    capture_assembled = pyqtSignal(str, str, str)
+    excel_progress = pyqtSignal(int, int)
+    excel_finished = pyqtSignal(str, int, str)  # path, rows with errors, failure message
+    pdf_finished = pyqtSignal(object)  # PdfJob
+    preview_ready = pyqtSignal(int, object)  # capture id, preview-sized PIL image
+    recovery_finished = pyqtSignal(object)  # RecoveredSession
+    backend_ready = pyqtSignal(str)  # Name of the backend ensure_backend() created, from any thread
+    status_message = pyqtSignal(str)  # Status text from the hotkey thread, which must not touch widgets
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Screenshot Tool")
-        self.screenshot_count = 1
         self.capture_enabled = False
         self.default_key = 'home'
-        self.doc_path = None
-        self.doc = None
-        self.captured_data = []  # To store data for Excel
-        self.captured_images = []  # To keep track of captured image paths
-        self.delete_images_after_save = False
+        self.default_recording_key = 'end'
+        self.session = None  # CaptureSession for the document being captured into
         self.selected_monitors = []  # List of selected monitor indices
-        self.capture_mode = "single"  # "single", "all", "multiple"
+        self.capture_mode = "single"  # "single", "all", "multiple", "region", "window", "selection"
+        self.regions = RegionStore()  # Saved regions and each test case's selected region
+        self.region_selector = None
+        self.backend = None  # Created on first use or by the warm-up thread; see ensure_backend()
+        self.backend_choice = "auto"
+        self.backend_lock = threading.Lock()
 
         # Configure logging
-        logging.basicConfig(filename='screenshot_app.log', level=logging.DEBUG,
-                            format='%(asctime)s - %(levelname)s - %(message)s')
+        setup_logging('screenshot_app.log', level=logging.DEBUG)
         logging.info("Application started")  # Log application startup
 
+        self.capture_assembled.connect(self.on_capture_assembled)
+        self.excel_progress.connect(self.on_excel_progress)
+        self.excel_finished.connect(self.on_excel_finished)
+        self.excel_thread = None
+        self.excel_queue = []  # Sessions whose Excel export waits for the running one
+        self.deferred_cleanup = []  # Images to delete once the queued Excel exports have read them
+        self.pdf_finished.connect(self.on_pdf_finished)
+        self.pdf_service = PdfService(on_done=self.pdf_finished.emit)
+        self.preview_ready.connect(self.on_preview_ready)
+        self.pending_preview = None  # Newest preview not rendered yet
+        self.strip_capture_id = -1  # Newest capture shown in the thumbnail strip
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(100)  # Bursts render only their newest frame
+        self.preview_timer.timeout.connect(self.render_preview)
+        self.recovery_finished.connect(self.on_recovery_finished)
+        self.backend_ready.connect(self.on_backend_ready)
+        # What the hotkey callbacks need from the widgets, copied on the GUI thread by snapshot_inputs()
+        self.current_settings = None  # SessionSettings
+        self.current_description = ""
+        self.current_record_seconds = 0
+        self.current_selection = ([], "")  # (targets, message shown when there are none)
+        # Monitor layout, rebuilt only when Qt reports a screen change; read by the hotkey thread
+        self.topology = MonitorTopology()
+        self.screen_targets = []  # CaptureTarget per monitor, in topology order
+        self.all_screens_target = None
+        self.topology_timer = QTimer(self)
+        self.topology_timer.setSingleShot(True)
+        self.topology_timer.setInterval(250)  # Docking fires a burst of screen signals
+        self.topology_timer.timeout.connect(self.refresh_topology)
+        self.topology_timer.timeout.connect(self.snapshot_inputs)
         self.init_ui()
+        self.watch_screens()
+        QTimer.singleShot(0, self.startup_finished)
+        QTimer.singleShot(0, self.check_unfinished_sessions)
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -74,18 +123,61 @@ class ScreenshotApp(QWidget):
         self.monitor_mode_combo.addItem("Single Monitor")
         self.monitor_mode_combo.addItem("Capture All Monitors (Stitched)")
         self.monitor_mode_combo.addItem("Select Multiple Monitors")
+        self.monitor_mode_combo.addItem("Saved Region")
+        self.monitor_mode_combo.addItem("Active Window")
+        self.monitor_mode_combo.addItem("Selected Region (This Test Case)")
         self.monitor_mode_combo.currentIndexChanged.connect(self.monitor_mode_changed)
         monitor_layout.addWidget(self.monitor_mode_combo)
 
         self.single_monitor_combo = QComboBox()
-        self.populate_single_monitor_combo()
         monitor_layout.addWidget(self.single_monitor_combo)
 
         self.multiple_monitor_list = QListWidget()
-        self.populate_multiple_monitor_list()
         monitor_layout.addWidget(self.multiple_monitor_list)
+        self.refresh_topology()
+
+        self.single_grab_checkbox = QCheckBox("Grab Selected Monitors at Once")
+        self.single_grab_checkbox.setChecked(True)
+        monitor_layout.addWidget(self.single_grab_checkbox)
+
+        self.region_widget = QWidget()
+        region_layout = QHBoxLayout()
+        region_layout.setContentsMargins(0, 0, 0, 0)
+        self.region_combo = QComboBox()
+        self.populate_region_combo()
+        region_layout.addWidget(self.region_combo, 1)
+        self.region_label = QLabel("")
+        region_layout.addWidget(self.region_label, 1)
+        self.select_region_button = QPushButton("Select Region...")
+        self.select_region_button.clicked.connect(self.select_region)
+        region_layout.addWidget(self.select_region_button)
+        self.save_region_button = QPushButton("Save As...")
+        self.save_region_button.setToolTip("Save this test case's selected region under a name")
+        self.save_region_button.clicked.connect(self.save_named_region)
+        region_layout.addWidget(self.save_region_button)
+        self.delete_region_button = QPushButton("Delete")
+        self.delete_region_button.clicked.connect(self.delete_named_region)
+        region_layout.addWidget(self.delete_region_button)
+        self.region_widget.setLayout(region_layout)
+        monitor_layout.addWidget(self.region_widget)
+        self.test_case_input.textChanged.connect(self.update_region_label)
+        self.update_region_label()
 
         self.update_monitor_visibility()
+
+        backend_layout = QHBoxLayout()
+        backend_layout.addWidget(QLabel("Capture Backend:"))
+        self.backend_combo = QComboBox()
+        # Listed without probing; the backend is only created (and monitors enumerated) after start-up
+        self.backend_combo.addItem("auto")
+        for name in BACKENDS:
+            self.backend_combo.addItem(name)
+        self.backend_combo.currentTextChanged.connect(self.backend_changed)
+        backend_layout.addWidget(self.backend_combo)
+        self.backend_label = QLabel("")  # The backend actually in use, once it has been created
+        backend_layout.addWidget(self.backend_label)
+        monitor_layout.addLayout(backend_layout)
+
         monitor_group.setLayout(monitor_layout)
         layout.addWidget(monitor_group)
 
@@ -108,6 +200,11 @@ class ScreenshotApp(QWidget):
         self.increment_spin.setValue(1)
         self.delete_checkbox = QCheckBox("Delete Images After Save")
         self.generate_excel_checkbox = QCheckBox("Generate Excel Document with Images")
+        self.stream_checkbox = QCheckBox("Stream Document to Disk (New Captures)")
+        self.stream_checkbox.setChecked(True)
+        self.checkpoint_spin = QSpinBox()
+        self.checkpoint_spin.setRange(1, 500)
+        self.checkpoint_spin.setValue(10)
 
         output_layout.addWidget(self.timestamp_checkbox)
         output_layout.addWidget(self.increment_checkbox)
@@ -116,11 +213,142 @@ class ScreenshotApp(QWidget):
         inc_layout.addWidget(self.increment_spin)
         output_layout.addLayout(inc_layout)
         output_layout.addWidget(self.delete_checkbox)
+        self.blob_store_checkbox = QCheckBox("Store Each Distinct Image Once (Image Store)")
+        self.blob_store_checkbox.setChecked(True)
+        output_layout.addWidget(self.blob_store_checkbox)
+        retention_layout = QHBoxLayout()
+        retention_layout.addWidget(QLabel("Remove Stored Images Unused For (Days):"))
+        self.keep_days_spin = QSpinBox()
+        self.keep_days_spin.setRange(0, 3650)
+        self.keep_days_spin.setSpecialValueText("Never")
+        self.keep_days_spin.setValue(0)
+        retention_layout.addWidget(self.keep_days_spin)
+        output_layout.addLayout(retention_layout)
         output_layout.addWidget(self.generate_excel_checkbox)
+        self.generate_pdf_checkbox = QCheckBox("Generate PDF on Save")
+        output_layout.addWidget(self.generate_pdf_checkbox)
+        pdf_layout = QHBoxLayout()
+        pdf_layout.addWidget(QLabel("PDF Engine:"))
+        self.pdf_engine_combo = QComboBox()
+        self.pdf_engine_combo.addItem("Auto")
+        self.pdf_engine_combo.addItem("Built-in")
+        self.pdf_engine_combo.addItem("LibreOffice")
+        self.pdf_engine_combo.addItem("Microsoft Word")
+        pdf_layout.addWidget(self.pdf_engine_combo)
+        output_layout.addLayout(pdf_layout)
+        output_layout.addWidget(self.stream_checkbox)
+        checkpoint_layout = QHBoxLayout()
+        checkpoint_layout.addWidget(QLabel("Checkpoint Every (Screenshots):"))
+        checkpoint_layout.addWidget(self.checkpoint_spin)
+        output_layout.addLayout(checkpoint_layout)
 
         output_group.setLayout(output_layout)
         layout.addWidget(output_group)
 
+        # Group: Image Encoding
+        encode_group = QGroupBox("Image Encoding")
+        encode_layout = QVBoxLayout()
+        format_layout = QHBoxLayout()
+        format_layout.addWidget(QLabel("Format:"))
+        self.format_combo = QComboBox()
+        self.format_combo.addItem("PNG")
+        self.format_combo.addItem("JPEG")
+        self.format_combo.addItem("WebP (Lossless)")
+        format_layout.addWidget(self.format_combo)
+        format_layout.addWidget(QLabel("PNG Compression:"))
+        self.png_level_spin = QSpinBox()
+        self.png_level_spin.setRange(0, 9)
+        self.png_level_spin.setValue(6)
+        format_layout.addWidget(self.png_level_spin)
+        format_layout.addWidget(QLabel("JPEG Quality:"))
+        self.jpeg_quality_spin = QSpinBox()
+        self.jpeg_quality_spin.setRange(50, 100)
+        self.jpeg_quality_spin.setValue(85)
+        format_layout.addWidget(self.jpeg_quality_spin)
+        encode_layout.addLayout(format_layout)
+        scale_layout = QHBoxLayout()
+        self.downscale_checkbox = QCheckBox("Downscale to Document Size at DPI:")
+        self.downscale_checkbox.setChecked(True)
+        scale_layout.addWidget(self.downscale_checkbox)
+        self.dpi_spin = QSpinBox()
+        self.dpi_spin.setRange(72, 600)
+        self.dpi_spin.setValue(150)
+        scale_layout.addWidget(self.dpi_spin)
+        encode_layout.addLayout(scale_layout)
+        self.quantize_checkbox = QCheckBox("Reduce to 256 Colours (UI Screenshots)")
+        self.keep_original_checkbox = QCheckBox("Keep Full-Resolution Originals")
+        encode_layout.addWidget(self.quantize_checkbox)
+        encode_layout.addWidget(self.keep_original_checkbox)
+        dedupe_layout = QHBoxLayout()
+        dedupe_layout.addWidget(QLabel("Unchanged Screens:"))
+        self.dedupe_combo = QComboBox()
+        self.dedupe_combo.addItem("Keep")
+        self.dedupe_combo.addItem("Skip")
+        self.dedupe_combo.addItem("Reference Previous Image")
+        self.dedupe_combo.addItem("Crop to Changed Area")
+        dedupe_layout.addWidget(self.dedupe_combo)
+        dedupe_layout.addWidget(QLabel("Ignore Changes Up To (Pixels):"))
+        self.dedupe_area_spin = QSpinBox()
+        self.dedupe_area_spin.setRange(0, 10000)
+        self.dedupe_area_spin.setValue(16)
+        self.dedupe_area_spin.setToolTip("A blinking cursor is about 16 pixels; a changed word is hundreds")
+        dedupe_layout.addWidget(self.dedupe_area_spin)
+        encode_layout.addLayout(dedupe_layout)
+        encode_group.setLayout(encode_layout)
+        layout.addWidget(encode_group)
+
+        # Group: Capture Pipeline
+        pipeline_group = QGroupBox("Capture Pipeline")
+        pipeline_layout = QHBoxLayout()
+        pipeline_layout.addWidget(QLabel("Queue Depth:"))
+        self.queue_depth_spin = QSpinBox()
+        self.queue_depth_spin.setRange(1, 64)
+        self.queue_depth_spin.setValue(8)
+        pipeline_layout.addWidget(self.queue_depth_spin)
+        pipeline_layout.addWidget(QLabel("Workers:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 8)
+        self.workers_spin.setValue(2)
+        pipeline_layout.addWidget(self.workers_spin)
+        pipeline_layout.addWidget(QLabel("When Full:"))
+        self.queue_policy_combo = QComboBox()
+        self.queue_policy_combo.addItem("Block")
+        self.queue_policy_combo.addItem("Drop")
+        pipeline_layout.addWidget(self.queue_policy_combo)
+        pipeline_group.setLayout(pipeline_layout)
+        layout.addWidget(pipeline_group)
+
+        # Group: Continuous Recording
+        recording_group = QGroupBox("Continuous Recording")
+        recording_layout = QVBoxLayout()
+        recording_row = QHBoxLayout()
+        self.record_checkbox = QCheckBox("Record Continuously While Capturing")
+        recording_row.addWidget(self.record_checkbox)
+        recording_row.addWidget(QLabel("Frames per Second:"))
+        self.record_fps_spin = QDoubleSpinBox()
+        self.record_fps_spin.setRange(0.5, 30.0)
+        self.record_fps_spin.setSingleStep(0.5)
+        self.record_fps_spin.setValue(2.0)
+        recording_row.addWidget(self.record_fps_spin)
+        recording_layout.addLayout(recording_row)
+        save_row = QHBoxLayout()
+        save_row.addWidget(QLabel("Save Last (Seconds):"))
+        self.record_seconds_spin = QSpinBox()
+        self.record_seconds_spin.setRange(1, 300)
+        self.record_seconds_spin.setValue(10)
+        save_row.addWidget(self.record_seconds_spin)
+        save_row.addWidget(QLabel("Buffer Limit (MB):"))
+        self.record_buffer_spin = QSpinBox()
+        self.record_buffer_spin.setRange(16, 4096)
+        self.record_buffer_spin.setValue(256)
+        save_row.addWidget(self.record_buffer_spin)
+        save_row.addWidget(QLabel("Save Recording Key:"))
+        self.recording_key_input = QLineEdit(self.default_recording_key)
+        save_row.addWidget(self.recording_key_input)
+        recording_layout.addLayout(save_row)
+        recording_group.setLayout(recording_layout)
+        layout.addWidget(recording_group)
+
         # Group: Screenshot Description
         layout.addWidget(QLabel("Screenshot Description:"))
         self.description_input = QLineEdit()
@@ -129,9 +357,18 @@ class ScreenshotApp(QWidget):
         # Group: Screenshot Preview
         layout.addWidget(QLabel("Screenshot Preview:"))
         self.preview_label = QLabel()
-        self.preview_label.setFixedSize(300, 200)
+        self.preview_label.setFixedSize(*PREVIEW_SIZE)
         self.preview_label.setStyleSheet("border: 1px solid black;")
         layout.addWidget(self.preview_label)
+        self.thumbnail_strip = QListWidget()
+        self.thumbnail_strip.setViewMode(QListView.IconMode)
+        self.thumbnail_strip.setFlow(QListView.LeftToRight)
+        self.thumbnail_strip.setWrapping(False)
+        self.thumbnail_strip.setMovement(QListView.Static)
+        self.thumbnail_strip.setIconSize(QSize(*STRIP_SIZE))
+        self.thumbnail_strip.setFixedHeight(STRIP_SIZE[1] + 30)
+        self.thumbnail_strip.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        layout.addWidget(self.thumbnail_strip)
 
         # Buttons
         button_layout = QHBoxLayout()
@@ -139,6 +376,10 @@ class ScreenshotApp(QWidget):
         self.append_button = QPushButton("Append to Existing")
         self.stop_button = QPushButton("End Capture & Save")
         self.convert_pdf_button = QPushButton("Convert to PDF")
+        self.batch_pdf_button = QPushButton("Batch PDF...")
+        self.batch_pdf_button.clicked.connect(self.batch_convert_to_pdf)
+        self.metrics_button = QPushButton("Export Metrics...")
+        self.metrics_button.clicked.connect(self.export_metrics)
         self.start_button.clicked.connect(self.start_new_capture)
         self.append_button.clicked.connect(self.append_to_existing)
         self.stop_button.clicked.connect(self.stop_capture)
@@ -147,28 +388,84 @@ class ScreenshotApp(QWidget):
         button_layout.addWidget(self.append_button)
         button_layout.addWidget(self.stop_button)
         button_layout.addWidget(self.convert_pdf_button)
+        button_layout.addWidget(self.batch_pdf_button)
+        button_layout.addWidget(self.metrics_button)
         layout.addLayout(button_layout)
 
         # Status
         self.status_label = QLabel("Status: Ready")
         layout.addWidget(self.status_label)
+        self.latency_label = QLabel("")
+        layout.addWidget(self.latency_label)
+        self.encode_label = QLabel("")
+        layout.addWidget(self.encode_label)
+        self.status_message.connect(self.status_label.setText)
 
         self.setLayout(layout)
 
+        # Any input change refreshes the snapshot the hotkey callbacks read
+        for widget in self.findChildren(QLineEdit):
+            widget.textChanged.connect(self.snapshot_inputs)
+        for widget in self.findChildren(QCheckBox):
+            widget.toggled.connect(self.snapshot_inputs)
+        for widget in self.findChildren((QSpinBox, QDoubleSpinBox)):
+            widget.valueChanged.connect(self.snapshot_inputs)
+        for widget in self.findChildren(QComboBox):
+            widget.currentIndexChanged.connect(self.snapshot_inputs)
+        self.multiple_monitor_list.itemChanged.connect(self.snapshot_inputs)
+        self.snapshot_inputs()
+
+    def snapshot_inputs(self, *changed):
+        """Copies the widget state the hotkey callbacks use. Runs on the GUI thread whenever an input changes."""
+        self.current_settings = self.session_settings()
+        self.current_description = self.description_input.text().strip()
+        self.current_record_seconds = self.record_seconds_spin.value()
+        self.current_selection = self.selected_targets()
+
+    def watch_screens(self):
+        """Invalidates the cached topology when a screen is added, removed, moved or rescaled."""
+        app = QApplication.instance()
+        app.screenAdded.connect(self.on_screen_added)
+        app.screenRemoved.connect(lambda screen: self.topology_timer.start())
+        for screen in app.screens():
+            self.watch_screen(screen)
+
+    def watch_screen(self, screen):
+        screen.geometryChanged.connect(lambda geometry: self.topology_timer.start())
+        screen.logicalDotsPerInchChanged.connect(lambda dpi: self.topology_timer.start())
+
+    def on_screen_added(self, screen):
+        self.watch_screen(screen)
+        self.topology_timer.start()
+
+    def refresh_topology(self):
+        """Recomputes monitor rectangles and capture targets, and refreshes the monitor pickers."""
+        topology = MonitorTopology.from_screens(QApplication.screens())
+        if topology == self.topology:
+            return
+        self.topology = topology
+        self.all_screens_target = all_monitors_target(topology.rects) if topology.rects else None
+        self.screen_targets = monitor_targets(topology.rects, range(len(topology)))
+        self.populate_single_monitor_combo()
+        self.populate_multiple_monitor_list()
+        logging.info(f"Monitor layout: {topology.rects}")
+
     def populate_single_monitor_combo(self):
+        selected = self.single_monitor_combo.currentIndex()
         self.single_monitor_combo.clear()
-        screens = QApplication.screens()
-        for i, screen in enumerate(screens):
-            self.single_monitor_combo.addItem(f"Monitor {i + 1}")
+        for i in range(len(self.topology)):
+            self.single_monitor_combo.addItem(self.topology.label(i))
+        self.single_monitor_combo.setCurrentIndex(selected if 0 <= selected < len(self.topology) else 0)
         logging.info("Populated single monitor combo box")
 
     def populate_multiple_monitor_list(self):
+        checked = {i for i in range(self.multiple_monitor_list.count())
+                   if self.multiple_monitor_list.item(i).checkState() == Qt.Checked}
         self.multiple_monitor_list.clear()
-        screens = QApplication.screens()
-        for i, screen in enumerate(screens):
-            item = QListWidgetItem(f"Monitor {i + 1}")
+        for i in range(len(self.topology)):
+            item = QListWidgetItem(self.topology.label(i))
             item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-            item.setCheckState(Qt.Unchecked)
+            item.setCheckState(Qt.Checked if i in checked else Qt.Unchecked)
             self.multiple_monitor_list.addItem(item)
         logging.info("Populated multiple monitor list")
 
@@ -176,288 +473,574 @@ class ScreenshotApp(QWidget):
         mode = self.monitor_mode_combo.currentText()
         self.single_monitor_combo.setVisible(mode == "Single Monitor")
         self.multiple_monitor_list.setVisible(mode == "Select Multiple Monitors")
+        self.single_grab_checkbox.setVisible(mode == "Select Multiple Monitors")
+        self.region_widget.setVisible(self.capture_mode in ("region", "selection"))
+        self.region_combo.setVisible(self.capture_mode == "region")
+        self.delete_region_button.setVisible(self.capture_mode == "region")
+        self.region_label.setVisible(self.capture_mode == "selection")
         logging.info(f"Updated monitor visibility. Mode: {mode}")
 
     def monitor_mode_changed(self, index):
-        self.capture_mode = ["single", "all", "multiple"][index]
+        self.capture_mode = ["single", "all", "multiple", "region", "window", "selection"][index]
         self.update_monitor_visibility()
         logging.info(f"Monitor mode changed to: {self.capture_mode}")
 
+    def case_name(self):
+        return self.test_case_input.text().strip() or "Evidence"
+
+    def populate_region_combo(self, selected=None):
+        selected = selected or self.region_combo.currentText()
+        self.region_combo.clear()
+        names = self.regions.names()
+        self.region_combo.addItems(names)
+        if selected in names:
+            self.region_combo.setCurrentIndex(names.index(selected))
+
+    def update_region_label(self):
+        rect = self.regions.case_region(self.case_name())
+        self.region_label.setText(f"{rect[2]}x{rect[3]} at ({rect[0]}, {rect[1]})" if rect
+                                  else "No region selected for this test case")
+
+    def select_region(self):
+        """Covers the desktop with a translucent overlay; the dragged rectangle becomes the test case's region."""
+        self.region_selector = RegionSelector()
+        self.region_selector.selected.connect(self.on_region_selected)
+        self.region_selector.cancelled.connect(self.on_region_selection_ended)
+        self.hide()  # Keep this window out of the way of what is being selected
+        self.region_selector.start()
+
+    def on_region_selected(self, rect):
+        self.on_region_selection_ended()
+        physical = self.topology.to_physical(rect.getRect())
+        if min(physical[2], physical[3]) < MIN_SIZE:
+            self.status_label.setText("Region too small; drag a larger rectangle.")
+            return
+        self.regions.set_case_region(self.case_name(), physical)
+        self.update_region_label()
+        self.snapshot_inputs()
+        self.status_label.setText(f"Selected region {physical[2]}x{physical[3]} for {self.case_name()}.")
+        if self.capture_mode == "region":
+            self.save_named_region()
+
+    def on_region_selection_ended(self):
+        self.region_selector = None
+        self.show()
+        self.activateWindow()
+
+    def save_named_region(self):
+        rect = self.regions.case_region(self.case_name())
+        if rect is None:
+            QMessageBox.warning(self, "Warning", "Select a region first.")
+            return
+        name, ok = QInputDialog.getText(self, "Save Region", "Region name:", text=self.region_combo.currentText())
+        name = name.strip()
+        if ok and name:
+            self.regions.save_region(name, rect)
+            self.populate_region_combo(selected=name)
+            self.snapshot_inputs()
+
+    def delete_named_region(self):
+        name = self.region_combo.currentText()
+        if name:
+            self.regions.delete_region(name)
+            self.populate_region_combo()
+            self.snapshot_inputs()
+
+    def set_capturing(self, active):
+        """Turns the hotkeys' capturing on or off; the backend cannot change under a running session."""
+        self.capture_enabled = active
+        self.backend_combo.setEnabled(not active)
+        self.backend_combo.setToolTip("End the capture to change the backend" if active else "")
+
+    def backend_changed(self, name):
+        if not name or name == self.backend_choice:
+            return
+        with self.backend_lock:
+            old, self.backend = self.backend, None
+            self.backend_choice = name
+        if old is not None:
+            old.close()
+        self.backend_label.setText("")
+        self.status_label.setText(f"Capture backend: {name}")
+        logging.info(f"Capture backend changed to: {name}")
+
+    def ensure_backend(self):
+        """The capture backend, created on first use (safe to call from any thread)."""
+        with self.backend_lock:
+            if self.backend is None:
+                self.backend = select_backend(None if self.backend_choice == "auto" else self.backend_choice)
+                self.backend_ready.emit(self.backend.name)
+            return self.backend
+
+    def on_backend_ready(self, name):
+        self.backend_label.setText(f"Using: {name}")
+        logging.info(f"Capture backend in use: {name}")
+
+    def startup_finished(self):
+        """Runs once the event loop has shown the window; warms the capture path in the background."""
+        elapsed_ms = (time.perf_counter() - STARTED) * 1000
+        observe("startup_window_shown", elapsed_ms)
+        logging.info(f"Window shown {elapsed_ms:.0f} ms after start")
+        threading.Thread(target=self.warm_up, name="warm-up", daemon=True).start()
+
+    def warm_up(self):
+        start = time.perf_counter()
+        try:
+            import keyboard  # noqa: F401
+            from PIL import Image, ImageChops  # noqa: F401
+            self.ensure_backend()
+        except Exception as e:
+            logging.warning(f"Warm-up incomplete: {e}")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        observe("startup_warm_up", elapsed_ms)
+        logging.info(f"Capture path warmed up in {elapsed_ms:.0f} ms")
+
     def browse_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select Output Folder")
         if folder:
             self.folder_input.setText(folder)
             logging.info(f"Output folder selected: {folder}")
 
+    def session_settings(self):
+        """Snapshot of the settings widgets for the capture session."""
+        mode = [DuplicateDetector.KEEP, DuplicateDetector.SKIP, DuplicateDetector.REFERENCE,
+                DuplicateDetector.CROP][self.dedupe_combo.currentIndex()]
+        return SessionSettings(
+            folder=self.folder_input.text().strip(),
+            case_name=self.test_case_input.text().strip() or "Evidence",
+            version=self.version_input.text().strip() or "v1",
+            add_timestamp=self.timestamp_checkbox.isChecked(),
+            auto_increment=self.increment_checkbox.isChecked(),
+            increment_by=self.increment_spin.value(),
+            single_grab=self.single_grab_checkbox.isChecked(),
+            encode=self.current_encode_settings(),
+            stream_document=self.stream_checkbox.isChecked(),
+            checkpoint_every=self.checkpoint_spin.value(),
+            queue_depth=self.queue_depth_spin.value(),
+            queue_policy=CapturePipeline.DROP if self.queue_policy_combo.currentText() == "Drop"
+            else CapturePipeline.BLOCK,
+            workers=self.workers_spin.value(),
+            dedupe_mode=mode,
+            dedupe_max_area=self.dedupe_area_spin.value(),
+            delete_images_after_save=self.delete_checkbox.isChecked(),
+            blob_store=self.blob_store_checkbox.isChecked(),
+            keep_images_days=self.keep_days_spin.value() or None)
+
+    def new_session(self):
+        if self.session is not None and self.session.active:
+            self.session.stop()  # Starting over without "End Capture & Save" still keeps the old document
+        self.thumbnail_strip.clear()
+        self.strip_capture_id = -1
+        return CaptureSession(self.ensure_backend(), self.session_settings(), on_captured=self.capture_assembled.emit,
+                              on_preview=self.preview_ready.emit)
+
     def start_new_capture(self):
+        import keyboard
         try:
-            self.capture_enabled = True
-            self.screenshot_count = 1
             self.status_label.setText("Status: Capture Started (New Document)")
             self.hotkey = self.hotkey_input.text().strip().lower()
+            self.session = self.new_session()
+            self.session.start_new()
+            self.set_capturing(True)
             keyboard.add_hotkey(self.hotkey, self.capture_screenshot)
-
-            folder = self.folder_input.text().strip()
-            case_name = self.test_case_input.text().strip() or "Evidence"
-            version = self.version_input.text().strip() or "v1"
-            self.doc_path = os.path.join(folder, f"{case_name}_{version}.docx")
-            self.excel_path = os.path.join(folder, f"{case_name}_{version}.xlsx")
-            self.doc = Document()
-            self.captured_data = []
-            self.captured_images = []
-            self.delete_images_after_save = self.delete_checkbox.isChecked()
-
-            logging.info(f"Started new capture. Document path: {self.doc_path}, Excel path: {self.excel_path}")
+            self.start_recording()
         except Exception as e:
             logging.error(f"Error starting new capture: {e}")
             QMessageBox.critical(self, "Error", f"Error starting new capture: {e}")
 
     def append_to_existing(self):
+        import keyboard
         try:
             options = QFileDialog.Options()
             options |= QFileDialog.DontUseNativeDialog
             file_path, _ = QFileDialog.getOpenFileName(self, "Select Existing Word Document", "",
                                                       "Word Documents (*.docx)", options=options)
             if file_path:
-                self.doc_path = file_path
-                self.doc = Document(self.doc_path)
-                self.capture_enabled = True
+                self.session = self.new_session()
+                self.session.append(file_path)
+                self.set_capturing(True)
                 self.status_label.setText(
-                    f"Status: Capture Started (Appending to {os.path.basename(self.doc_path)})")
+                    f"Status: Capture Started (Appending to {os.path.basename(file_path)})")
                 self.hotkey = self.hotkey_input.text().strip().lower()
                 keyboard.add_hotkey(self.hotkey, self.capture_screenshot)
-                last_paragraph = self.doc.paragraphs[-1].text if self.doc.paragraphs else ""
-                if "Screenshot" in last_paragraph:
-                    try:
-                        self.screenshot_count = int(last_paragraph.split("Screenshot ")[1].split(":")[0]) + 1
-                    except ValueError:
-                        self.screenshot_count = 1
-                else:
-                    self.screenshot_count = 1
-                self.captured_data = []  # Reset Excel data for append session
-                self.captured_images = []  # Reset image list for this append session
-                self.delete_images_after_save = self.delete_checkbox.isChecked()
-                logging.info(f"Appending to existing document: {self.doc_path}")
+                self.start_recording()
         except Exception as e:
             logging.error(f"Error appending to existing document: {e}")
             QMessageBox.critical(self, "Error", f"Could not open Word document: {e}")
-            self.doc_path = None
-            self.doc = None
+            self.session = None
 
     def stop_capture(self):
+        import keyboard
         try:
-            self.capture_enabled = False
+            self.set_capturing(False)
             keyboard.unhook_all_hotkeys()
 
-            if self.doc and self.doc_path:
-                self.doc.save(self.doc_path)
-                self.status_label.setText(f"Capture complete. Word document saved to: {self.doc_path}")
-                logging.info(f"Capture complete. Word document saved to: {self.doc_path}")
-                if self.generate_excel_checkbox.isChecked() and self.captured_data:
+            doc_path = self.session.stop() if self.session else None
+            if doc_path:
+                self.status_label.setText(f"Capture complete. Word document saved to: {doc_path}")
+                if self.generate_excel_checkbox.isChecked() and self.session.captured_data:
                     self.generate_excel()
 
-                # Convert to PDF (optional, only if a new document was started)
-                if "New Document" in self.status_label.text():
-                    try:
-                        pdf_path = os.path.splitext(self.doc_path)[0] + ".pdf"
-                        convert(self.doc_path, pdf_path)
-                        self.status_label.setText(f"Word and PDF saved.")
-                        logging.info(f"Word and PDF saved. PDF path: {pdf_path}")
-                    except Exception as e:
-                        logging.error(f"PDF conversion failed: {e}")
-                        self.status_label.setText(f"Word saved. PDF conversion failed: {e}")
+                # Convert to PDF in the background (optional)
+                if self.generate_pdf_checkbox.isChecked():
+                    self.pdf_service.submit(PdfJob(doc_path, engine=self.pdf_engine()))
             else:
                 self.status_label.setText("Capture ended. No document to save.")
                 logging.info("Capture ended. No document to save.")
 
-            # Delete captured images if the checkbox is checked
-            if self.delete_images_after_save:
-                self.cleanup_captured_images()
+            # Delete captured images if the checkbox is checked (after the Excel export has read them)
+            if self.session and self.session.settings.delete_images_after_save:
+                if self.excel_thread is None:
+                    self.cleanup_captured_images()
+                else:
+                    self.deferred_cleanup.extend(self.session.captured_images)
+                    self.session.captured_images = []
         except Exception as e:
             logging.error(f"Error stopping capture: {e}")
             QMessageBox.critical(self, "Error", f"Error stopping capture: {e}")
 
-    def convert_to_pdf(self):
-        if self.doc_path and os.path.exists(self.doc_path):
-            pdf_path = os.path.splitext(self.doc_path)[0] + ".pdf"
+    def start_recording(self):
+        """Starts the ring-buffer recording and its hotkey if "Record Continuously" is checked."""
+        import keyboard
+        if not self.record_checkbox.isChecked():
+            return
+        targets = self.current_targets()
+        if not targets:
+            return
+        seconds = self.record_seconds_spin.value()
+        self.session.start_recording(targets, fps=self.record_fps_spin.value(), seconds=seconds,
+                                     max_megabytes=self.record_buffer_spin.value())
+        self.recording_key = self.recording_key_input.text().strip().lower()
+        keyboard.add_hotkey(self.recording_key, self.save_recording)
+        self.status_label.setText(self.status_label.text() +
+                                  f" - recording, press {self.recording_key} to save the last {seconds} s")
+
+    def save_recording(self):
+        """Recording hotkey callback: queues the buffered frames for the document."""
+        if not self.capture_enabled or self.session is None or not self.session.active:
+            return
+        seconds = self.current_record_seconds
+        count = self.session.screenshot_count
+        frames = self.session.save_recording(seconds, self.current_description)
+        if frames:
+            self.status_message.emit(f"Saving {frames} recorded frame(s) from the last {seconds} s "
+                                     f"as screenshot {count}...")
+        else:
+            self.status_message.emit("No recorded frames to save.")
+
+    def check_unfinished_sessions(self):
+        """Offers to rebuild the documents of sessions that ended without "End Capture & Save"."""
+        for journal_path in unfinished_journals():
+            try:
+                header, records = read_journal(journal_path)
+            except (OSError, ValueError) as e:
+                logging.error(f"Unreadable session journal {journal_path}: {e}")
+                continue
+            answer = QMessageBox.question(
+                self, "Unfinished Capture Session",
+                f"A capture session was not saved:\n{header['doc_path']}\n({len(records)} screenshot(s))\n\n"
+                "Rebuild the Word document and Excel report from the captured images?\n"
+                "Choose Discard to forget this session.",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Discard, QMessageBox.Yes)
+            if answer == QMessageBox.Yes:
+                threading.Thread(target=self.run_recovery, args=(journal_path,), name="session-recovery",
+                                 daemon=True).start()
+                self.status_label.setText(f"Recovering {os.path.basename(header['doc_path'])}...")
+            elif answer == QMessageBox.Discard:
+                discard_journal(journal_path)
+                logging.info(f"Discarded session journal: {journal_path}")
+
+    def run_recovery(self, journal_path):
+        self.recovery_finished.emit(recover_session(journal_path))
+
+    def on_recovery_finished(self, result):
+        self.status_label.setText(result.summary())
+        if result.error:
+            QMessageBox.critical(self, "Recovery Failed", result.summary())
+        elif result.warning:
+            QMessageBox.warning(self, "Session Partly Recovered", result.summary())
+        else:
+            QMessageBox.information(self, "Session Recovered", result.summary())
+
+    def export_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "screenshot_metrics.json",
+                                              "JSON (*.json);;Prometheus Text (*.prom)")
+        if path:
             try:
-                convert(self.doc_path, pdf_path)
-                self.status_label.setText(f"Word document converted to PDF: {pdf_path}")
-                QMessageBox.information(self, "Conversion Successful",
-                                        f"Word document successfully converted to PDF:\n{pdf_path}")
-                logging.info(f"Word document converted to PDF: {pdf_path}")
-            except Exception as e:
-                logging.error(f"PDF conversion failed: {e}")
-                self.status_label.setText(f"PDF conversion failed: {e}")
-                QMessageBox.critical(self, "Conversion Failed",
-                                     f"Error converting to PDF:\n{e}\n\nMake sure Microsoft Word is installed.")
+                export_metrics(path)
+                self.status_label.setText(f"Metrics exported to: {path}")
+                logging.info(f"Metrics exported to: {path}\n{REGISTRY.report()}")
+            except OSError as e:
+                QMessageBox.critical(self, "Error", f"Could not export metrics: {e}")
+
+    def pdf_engine(self):
+        return ["auto", "builtin", "libreoffice", "word"][self.pdf_engine_combo.currentIndex()]
+
+    def convert_to_pdf(self):
+        doc_path = self.session.doc_path if self.session else None
+        if doc_path and os.path.exists(doc_path):
+            self.pdf_service.submit(PdfJob(doc_path, engine=self.pdf_engine(), notify=True))
+            self.status_label.setText(f"Converting {os.path.basename(doc_path)} to PDF...")
         else:
             self.status_label.setText("No Word document has been saved yet.")
             QMessageBox.warning(self, "No Word Document", "Please capture screenshots and save the Word document first.")
             logging.warning("No Word document has been saved yet.")
 
-    def cleanup_captured_images(self):
-        for img_path in self.captured_images:
-            try:
-                os.remove(img_path)
-                print(f"Deleted: {img_path}")
-                logging.info(f"Deleted image: {img_path}")
-            except Exception as e:
-                print(f"Error deleting {img_path}: {e}")
-                logging.error(f"Error deleting image: {img_path}: {e}")
-        self.captured_images = []
+    def batch_convert_to_pdf(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "Select Word Documents to Convert", "",
+                                                     "Word Documents (*.docx)")
+        if file_paths:
+            self.pdf_service.submit_batch(file_paths, engine=self.pdf_engine())
+            self.status_label.setText(f"Converting {len(file_paths)} document(s) to PDF...")
+            logging.info(f"Queued {len(file_paths)} document(s) for PDF conversion")
+
+    def on_pdf_finished(self, job):
+        message = job.summary()
+        pending = self.pdf_service.pending()
+        if pending:
+            message += f" ({pending} more queued)"
+        self.status_label.setText(message)
+        if job.error and job.notify:
+            hint = "\n\nMake sure Microsoft Word is installed." if job.engine == "word" else ""
+            QMessageBox.critical(self, "Conversion Failed", f"Error converting to PDF:\n{job.error}{hint}")
+        elif job.notify:
+            QMessageBox.information(self, "Conversion Successful",
+                                    f"Word document successfully converted to PDF:\n{job.pdf_path}\n\n"
+                                    f"{job.pages} pages, {job.size / 1048576:.1f} MB in {job.seconds:.1f} s")
+
+    def cleanup_captured_images(self, images=None):
+        if self.session is not None:
+            self.session.cleanup_captured_images(images)
 
     def generate_excel(self):
-        if not self.excel_path:
+        """Exports the Excel report in the background, after any export still running; on_excel_finished reports it."""
+        if not self.session or not self.session.excel_path:
             return
+        if self.excel_thread is not None:
+            self.excel_queue.append(self.session)
+            self.status_label.setText(f"Excel document queued: {self.session.excel_path}")
+            logging.info(f"Excel export queued behind the running one: {self.session.excel_path}")
+            return
+        self.start_excel_export(self.session)
 
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        sheet.append(["Co.", "Description", "Image"])  # Header row
-
-        for row_num, data in enumerate(self.captured_data):
-            sheet.cell(row=row_num + 2, column=1, value=data["co"])
-            sheet.cell(row=row_num + 2, column=2, value=data["description"])
-            try:
-                img = ExcelImage(data["image_path"])
-                #  Anchoring the image to the cell.
-                img.anchor = sheet.cell(row=row_num + 2, column=3).coordinate
-                sheet.add_image(img)
-
-                # Adjust row height to fit the image (optional)
-                img_height_px = Image.open(data["image_path"]).height
-                row_height_points = img_height_px * 72 / 96  # Approximate conversion
-                sheet.row_dimensions[row_num + 2].height = row_height_points
-
-                # Adjust column width for better image visibility (optional)
-                sheet.column_dimensions['C'].width = 40  # Adjust as needed.
-                logging.info(f"Added image to Excel: {data['image_path']}")
-            except Exception as e:
-                error_message = f"Error adding image to Excel: {e}"
-                print(error_message)
-                logging.error(error_message)
-                sheet.cell(row=row_num + 2, column=3, value=f"Error: {e}")
+    def start_excel_export(self, session):
+        self.excel_thread = threading.Thread(target=self.run_excel_export, args=(session,),
+                                             name="excel-export", daemon=True)
+        self.excel_thread.start()
+        self.status_label.setText(f"Generating Excel document (0/{len(session.captured_data)})...")
 
+    def run_excel_export(self, session):
         try:
-            workbook.save(self.excel_path)
-            self.status_label.setText(f"Excel document with images generated: {self.excel_path}")
-            QMessageBox.information(self, "Excel Generated",
-                                    f"Excel document with images successfully generated:\n{self.excel_path}")
-            logging.info(f"Excel document with images generated: {self.excel_path}")
+            errors = session.export_excel(progress=self.excel_progress.emit)
+            self.excel_finished.emit(session.excel_path, errors, "")
         except Exception as e:
-            error_message = f"Error generating Excel document with images: {e}"
+            self.excel_finished.emit(session.excel_path, 0, str(e))
+
+    def on_excel_progress(self, done, total):
+        self.status_label.setText(f"Generating Excel document ({done}/{total})...")
+
+    def on_excel_finished(self, excel_path, errors, failure):
+        self.excel_thread = None
+        if self.excel_queue:
+            self.start_excel_export(self.excel_queue.pop(0))
+        if failure:
+            error_message = f"Error generating Excel document with images: {failure}"
             self.status_label.setText(error_message)
             QMessageBox.critical(self, "Excel Generation Failed", error_message)
             logging.error(error_message)
+        else:
+            self.status_label.setText(f"Excel document with images generated: {excel_path}")
+            message = f"Excel document with images successfully generated:\n{excel_path}"
+            if errors:
+                message += f"\n\n{errors} image(s) could not be added; see the log for details."
+            QMessageBox.information(self, "Excel Generated", message)
+            logging.info(f"Excel document with images generated: {excel_path}")
+        if self.deferred_cleanup and self.excel_thread is None:
+            images, self.deferred_cleanup = self.deferred_cleanup, []
+            self.cleanup_captured_images(images)
 
     def capture_screenshot(self):
-        if not self.capture_enabled or self.doc is None:
+        """Hotkey callback: grabs raw pixels only and hands them to the capture pipeline."""
+        if not self.capture_enabled or self.session is None or not self.session.active:
+            return
+
+        targets = self.current_targets()
+        if not targets:
             return
 
-        folder = self.folder_input.text().strip()
-        if not os.path.exists(folder):
-            os.makedirs(folder)
+        # Pick up setting changes made since the last capture
+        self.session.settings = self.current_settings
+        count = self.session.screenshot_count
+        if not self.session.capture(targets, self.current_description, new_pages=self.capture_mode == "multiple"):
+            self.status_message.emit(f"Screenshot {count} dropped: capture queue is full.")
 
-        case_name = self.test_case_input.text().strip() or "Evidence"
-        description = self.description_input.text().strip()
-        co = self.screenshot_count  # Capture current count for Excel
-        if self.timestamp_checkbox.isChecked():
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            description += f"_{timestamp}"
+    def current_targets(self):
+        """The screen areas selected in "Monitor Selection", or None (with a message) if nothing is selected.
 
-        filename_base = f"{case_name}_{self.screenshot_count}_{description}".replace(" ", "_")
-        screens = QApplication.screens()
+        Reads only the snapshot taken by snapshot_inputs(), so it is safe on the hotkey thread.
+        """
+        if self.capture_mode == "window":
+            targets, message = self.window_targets()  # The foreground window changes without any Qt signal
+        else:
+            targets, message = self.current_selection
+        if not targets:
+            if message:
+                self.status_message.emit(message)
+                logging.warning(message)
+            return None
+        return targets
 
+    def selected_targets(self):
+        """(targets, message) for the widgets' current selection; message says why there are no targets."""
+        screen_targets = self.screen_targets
         if self.capture_mode == "single":
-            selected_index = self.single_monitor_combo.currentIndex()
-            if 0 <= selected_index < len(screens):
-                screen = screens[selected_index]
-                geometry = screen.geometry()
-                image_path = os.path.join(folder, f"{filename_base}_monitor_{selected_index + 1}.png")
-                screenshot = pyautogui.screenshot(
-                    region=(geometry.x(), geometry.y(), geometry.width(), geometry.height()))
-                screenshot.save(image_path)
-                self.add_to_word(image_path,
-                                 f"Screenshot {self.screenshot_count} (Monitor {selected_index + 1}): {description}")
-                self.captured_images.append(image_path)
-                self.captured_data.append({"co": co, "description": description, "image_path": image_path})
-                self.update_preview(image_path)
-                logging.info(f"Single monitor screenshot captured: {image_path}")
-        elif self.capture_mode == "all":
-            all_x = min(s.geometry().x() for s in screens)
-            all_y = min(s.geometry().y() for s in screens)
-            all_width = max(s.geometry().width() + s.geometry().x() for s in screens) - all_x
-            all_height = max(s.geometry().height() + s.geometry().y() for s in screens) - all_y
-            image_path = os.path.join(folder, f"{filename_base}_all_monitors.png")
-            screenshot = pyautogui.screenshot(region=(all_x, all_y, all_width, all_height))
-            screenshot.save(image_path)
-            self.add_to_word(image_path, f"Screenshot {self.screenshot_count} (All Monitors): {description}")
-            self.captured_images.append(image_path)
-            self.captured_data.append({"co": co, "description": description, "image_path": image_path})
-            self.update_preview(image_path)
-            logging.info(f"All monitors screenshot captured: {image_path}")
-        elif self.capture_mode == "multiple":
-            selected_indices = [i for i in range(self.multiple_monitor_list.count()) if
-                                self.multiple_monitor_list.item(i).checkState() == Qt.Checked]
-            for index in selected_indices:
-                if 0 <= index < len(screens):
-                    screen = screens[index]
-                    geometry = screen.geometry()
-                    image_path = os.path.join(folder, f"{filename_base}_monitor_{index + 1}.png")
-                    screenshot = pyautogui.screenshot(
-                        region=(geometry.x(), geometry.y(), geometry.width(), geometry.height()))
-                    screenshot.save(image_path)
-                    self.add_to_word(image_path,
-                                     f"Screenshot {self.screenshot_count} (Monitor {index + 1}): {description}",
-                                     new_page=True)
-                    self.captured_images.append(image_path)
-                    self.captured_data.append({"co": co, "description": description, "image_path": image_path})
-                    self.update_preview(image_path)
-                    logging.info(f"Multiple monitors screenshot captured: {image_path}")
-                    if len(selected_indices) > 1 and index < selected_indices[-1]:
-                        self.doc.add_page_break()
-            if not selected_indices:
-                self.status_label.setText("Please select at least one monitor in 'Select Multiple Monitors' mode.")
-                logging.warning("Please select at least one monitor in 'Select Multiple Monitors' mode.")
-                return
-
-        self.status_label.setText(f"Screenshot {self.screenshot_count} captured and added to document.")
-        if self.increment_checkbox.isChecked():
-            self.screenshot_count += self.increment_spin.value()
-
-    def add_to_word(self, image_path, description, new_page=False):
-        if new_page and self.doc.paragraphs:
-            self.doc.add_page_break()
-
-        paragraph = self.doc.add_paragraph()
-        run = paragraph.add_run(description)
-        run.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+            index = self.single_monitor_combo.currentIndex()
+            return [screen_targets[index]] if 0 <= index < len(screen_targets) else [], ""
+        if self.capture_mode == "all":
+            return [self.all_screens_target] if self.all_screens_target else [], ""
+        if self.capture_mode == "window":
+            return [], ""  # Looked up at capture time by window_targets()
+        if self.capture_mode in ("region", "selection"):
+            return self.region_targets()
+        selected_indices = [i for i in range(self.multiple_monitor_list.count()) if
+                            self.multiple_monitor_list.item(i).checkState() == Qt.Checked]
+        if not selected_indices:
+            return [], "Please select at least one monitor in 'Select Multiple Monitors' mode."
+        return [screen_targets[i] for i in selected_indices if i < len(screen_targets)], ""
 
-        try:
-            # Calculate available width (adjust margins as needed)
-            available_width = Inches(6.5)
-            img = Image.open(image_path)
-            img_width_px, img_height_px = img.size
-            aspect_ratio = img_height_px / img_width_px
-            scaled_width = available_width
-            scaled_height = scaled_width * aspect_ratio
-            self.doc.add_picture(image_path, width=scaled_width, height=scaled_height)
-            last_paragraph = self.doc.paragraphs[-1]
-            last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            logging.info(f"Added image to Word document: {image_path}")
-        except Exception as e:
-            error_message = f"Error adding image to Word document: {e}"
-            self.doc.add_paragraph(error_message)
-            logging.error(error_message)
+    def region_targets(self):
+        """(targets, message) for the saved or selected region, clipped to the desktop."""
+        if self.capture_mode == "region":
+            name = self.region_combo.currentText()
+            rect = self.regions.get(name) if name else None
+        else:
+            name = self.case_name()
+            rect = self.regions.case_region(name)
+        if rect is None:
+            return [], "Please select a region first (Select Region...)."
+        rect = self.topology.clip(rect)
+        if rect is None:
+            return [], f"Region {name} is not on any connected monitor."
+        return [region_target(name, rect)], ""
+
+    def window_targets(self):
+        """(targets, message) for the active window, clipped to the desktop. Safe on the hotkey thread."""
+        window = active_window()
+        rect = self.topology.clip(window[0]) if window else None
+        if rect is None:
+            return [], "Could not find the active window."
+        return [window_target(rect, window[1])], ""
+
+    def current_encode_settings(self):
+        return EncodeSettings(
+            format=["png", "jpeg", "webp"][self.format_combo.currentIndex()],
+            png_compress_level=self.png_level_spin.value(),
+            jpeg_quality=self.jpeg_quality_spin.value(),
+            downscale=self.downscale_checkbox.isChecked(),
+            dpi=self.dpi_spin.value(),
+            quantize=self.quantize_checkbox.isChecked(),
+            keep_original=self.keep_original_checkbox.isChecked())
+
+    def on_capture_assembled(self, image_path, message, encode_info):
+        self.status_label.setText(message)
+        if encode_info:
+            self.encode_label.setText(encode_info)
+        pipeline = self.session.pipeline if self.session else None
+        stats = pipeline.latency.summary() if pipeline else {}
+        if "grab" in stats and "total" in stats:
+            blocked = stats.get("backpressure", {"p50": 0, "p95": 0})
+            self.latency_label.setText(
+                f"Latency p50/p95 - grab: {stats['grab']['p50']:.0f}/{stats['grab']['p95']:.0f} ms, "
+                f"total: {stats['total']['p50']:.0f}/{stats['total']['p95']:.0f} ms, "
+                f"queued: {pipeline.pending()}, blocked: {blocked['p50']:.0f}/{blocked['p95']:.0f} ms, "
+                f"dropped: {pipeline.dropped}")
 
-        self.doc.add_paragraph("")  # Add a blank line for spacing
+    def on_preview_ready(self, capture_id, image):
+        self.pending_preview = (capture_id, image)
+        if not self.preview_timer.isActive():
+            self.preview_timer.start()
 
-    def update_preview(self, image_path):
+    def render_preview(self):
+        """Shows the newest pending preview and adds new captures to the strip."""
+        if self.pending_preview is None:
+            return
+        capture_id, image = self.pending_preview
+        self.pending_preview = None
+        self.update_preview(image)
+        self.update_thumbnail_strip()
+        logging.debug(f"Updated preview with capture {capture_id}")
+
+    def update_preview(self, image):
         """Updates the preview label with the most recently captured screenshot."""
-        pixmap = QPixmap(image_path)
-        pixmap = pixmap.scaled(self.preview_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.preview_label.setPixmap(pixmap)
-        logging.info(f"Updated preview with image: {image_path}")
+        with span("update_preview"):
+            self.preview_label.setPixmap(pixmap_from_image(image))
+
+    def update_thumbnail_strip(self):
+        previews = self.session.previews if self.session else None
+        if previews is None:
+            return
+        for capture_id, caption, thumbnail in previews.since(self.strip_capture_id):
+            item = QListWidgetItem(QIcon(pixmap_from_image(thumbnail)), str(capture_id + 1))
+            item.setToolTip(caption)
+            self.thumbnail_strip.addItem(item)
+            self.strip_capture_id = capture_id
+        while self.thumbnail_strip.count() > previews.max_entries:
+            self.thumbnail_strip.takeItem(0)
+        self.thumbnail_strip.scrollToBottom()
+
+
+class RegionSelector(QWidget):
+    """Translucent overlay over every monitor; drag a rectangle, or press Esc to cancel."""
+    selected = pyqtSignal(QRect)  # Global (Qt) coordinates
+    cancelled = pyqtSignal()
+
+    def __init__(self):
+        super().__init__(None, Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setCursor(Qt.CrossCursor)
+        self.rubber_band = QRubberBand(QRubberBand.Rectangle, self)
+        self.origin = None
+
+    def start(self):
+        desktop = QRect()
+        for screen in QApplication.screens():
+            desktop = desktop.united(screen.geometry())
+        self.setGeometry(desktop)
+        self.show()
+        self.activateWindow()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 80))
+
+    def mousePressEvent(self, event):
+        self.origin = event.pos()
+        self.rubber_band.setGeometry(QRect(self.origin, self.origin))
+        self.rubber_band.show()
+
+    def mouseMoveEvent(self, event):
+        if self.origin is not None:
+            self.rubber_band.setGeometry(QRect(self.origin, event.pos()).normalized())
+
+    def mouseReleaseEvent(self, event):
+        if self.origin is None:
+            return
+        rect = QRect(self.origin, event.pos()).normalized().translated(self.geometry().topLeft())
+        self.close()
+        self.selected.emit(rect)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.close()
+            self.cancelled.emit()
+
+
+def pixmap_from_image(image):
+    """QPixmap of an RGB PIL image (GUI thread only)."""
+    data = image.tobytes("raw", "RGB")
+    qimage = QImage(data, image.width, image.height, 3 * image.width, QImage.Format_RGB888)
+    return QPixmap.fromImage(qimage)
 
 
 if __name__ == "__main__":
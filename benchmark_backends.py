@@ -0,0 +1,43 @@
+"""Reports grab throughput (frames per second) for each capture backend and resolution.
+
+Usage: python benchmark_backends.py [--frames N] [--backend NAME ...]
+"""
+import argparse
+import time
+
+from capture_backends import BACKENDS, available_backends
+
+RESOLUTIONS = [(1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)]
+
+
+def benchmark(backend, width, height, frames):
+    backend.grab((0, 0, width, height))  # Warm up (connection setup, shared memory allocation)
+    start = time.perf_counter()
+    for _ in range(frames):
+        backend.grab((0, 0, width, height))
+    elapsed = time.perf_counter() - start
+    return frames / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--backend", action="append", help="Backend(s) to run (default: all available)")
+    args = parser.parse_args()
+
+    print(f"{'backend':<12}{'resolution':>12}{'fps':>10}")
+    for name in args.backend or available_backends():
+        backend = BACKENDS[name]()
+        try:
+            desktop = backend.monitors()[0]
+            for width, height in RESOLUTIONS:
+                if name != "synthetic" and (width > desktop[2] or height > desktop[3]):
+                    continue  # Larger than the primary monitor
+                fps = benchmark(backend, width, height, args.frames)
+                print(f"{name:<12}{f'{width}x{height}':>12}{fps:>10.1f}")
+        finally:
+            backend.close()
+
+
+if __name__ == "__main__":
+    main()
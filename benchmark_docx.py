@@ -0,0 +1,95 @@
+"""Compares peak RSS and save time of the in-memory and streaming Word backends.
+
+Each (backend, count) case runs in its own process so peak RSS is not shared.
+Usage: python benchmark_docx.py [--counts 50 500 2000] [--width 3840 --height 2160]
+"""
+import argparse
+import io
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+from docx_writer import EMU_PER_INCH, PythonDocxDocument, StreamingDocxWriter
+
+BACKENDS = {"python-docx": PythonDocxDocument, "streaming": StreamingDocxWriter}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def base_png(width, height):
+    from PIL import Image
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def unique_png(png, number):
+    """Inserts a tEXt chunk before IEND so every screenshot is a distinct image part."""
+    data = b"Comment\x00" + str(number).encode()
+    chunk = struct.pack(">I", len(data)) + b"tEXt" + data + struct.pack(">I", zlib.crc32(b"tEXt" + data))
+    return png[:-12] + chunk + png[-12:]
+
+
+def run_case(backend, count, width, height):
+    png = base_png(width, height)
+    width_emu = int(6.5 * EMU_PER_INCH)
+    height_emu = int(width_emu * height / width)
+    with tempfile.TemporaryDirectory() as folder:
+        doc = BACKENDS[backend](os.path.join(folder, "bench.docx"))
+        start = time.perf_counter()
+        for number in range(1, count + 1):
+            # The streaming writer reads each file at its next checkpoint, so every shot needs its own
+            image_path = os.path.join(folder, f"shot_{number}.png")
+            with open(image_path, "wb") as f:
+                f.write(unique_png(png, number))
+            doc.add_paragraph(f"Screenshot {number}: benchmark")
+            doc.add_picture(image_path, width_emu, height_emu)
+            doc.add_paragraph("")
+        assemble_time = time.perf_counter() - start
+        start = time.perf_counter()
+        doc.save()
+        save_time = time.perf_counter() - start
+        size = os.path.getsize(os.path.join(folder, "bench.docx"))
+    return {"backend": backend, "count": count, "assemble_s": assemble_time, "save_s": save_time,
+            "peak_rss_mb": peak_rss_mb(), "size_mb": size / (1024 * 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--case", nargs=2, metavar=("BACKEND", "COUNT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case[0], int(args.case[1]), args.width, args.height)))
+        return
+
+    print(f"{'backend':<14}{'shots':>7}{'assemble s':>12}{'save s':>9}{'peak RSS MB':>13}{'size MB':>9}")
+    for count in args.counts:
+        for backend in BACKENDS:
+            output = subprocess.run(
+                [sys.executable, __file__, "--case", backend, str(count),
+                 "--width", str(args.width), "--height", str(args.height)],
+                check=True, capture_output=True, text=True).stdout
+            r = json.loads(output)
+            print(f"{r['backend']:<14}{r['count']:>7}{r['assemble_s']:>12.2f}{r['save_s']:>9.2f}"
+                  f"{r['peak_rss_mb']:>13.1f}{r['size_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
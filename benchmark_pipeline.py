@@ -0,0 +1,92 @@
+"""Drives the capture path with synthetic frames and reports p50/p99 per stage.
+
+Every case captures --captures screenshots of --monitors side-by-side synthetic
+monitors at one resolution, through a real CaptureSession (encode, Word
+assembly, journal), into a temporary folder. Frames are generated
+deterministically, so runs are comparable between machines and commits.
+Usage: python benchmark_pipeline.py [--captures 30] [--monitors 1 2 3] [--json results.json]
+"""
+import argparse
+import json
+import tempfile
+
+from PIL import Image
+
+from capture_backends import SyntheticBackend
+from capture_session import CaptureSession, SessionSettings, monitor_targets
+from metrics import REGISTRY
+
+RESOLUTIONS = [(1920, 1080), (2560, 1440), (3840, 2160)]
+STAGES = ["pipeline_grab", "pipeline_backpressure", "pipeline_queue", "pipeline_encode", "add_to_word",
+          "pipeline_journal", "pipeline_total", "save"]
+
+
+class TexturedBackend(SyntheticBackend):
+    """Synthetic monitors showing gradients (which compress like real screens) with a moving block."""
+
+    def __init__(self, monitors=None):
+        super().__init__(monitors)
+        self._bases = {}
+
+    def grab(self, region):
+        _, _, width, height = region
+        base = self._bases.get((width, height))
+        if base is None:
+            horizontal = Image.linear_gradient("L").rotate(90).resize((width, height))
+            vertical = Image.linear_gradient("L").resize((width, height))
+            radial = Image.radial_gradient("L").resize((width, height))
+            base = self._bases[(width, height)] = Image.merge("RGB", (horizontal, vertical, radial))
+        with self._lock:
+            self._frame += 1
+            frame = self._frame
+        image = base.copy()
+        block = max(16, width // 20)
+        x = (frame * block) % max(1, width - block)
+        image.paste(((frame * 37) % 256, (frame * 91) % 256, (frame * 173) % 256), (x, 0, x + block, block))
+        return image
+
+
+def run_case(width, height, monitors, captures, workers):
+    rects = [(i * width, 0, width, height) for i in range(monitors)]
+    backend = TexturedBackend(rects)
+    with tempfile.TemporaryDirectory(prefix="benchmark_pipeline_") as folder:
+        session = CaptureSession(backend, SessionSettings(folder=folder, case_name="Benchmark",
+                                                          auto_increment=True, workers=workers))
+        session.start_new()
+        targets = monitor_targets(rects, range(monitors))
+        REGISTRY.reset()
+        for _ in range(captures):
+            session.capture(targets, "benchmark", new_pages=monitors > 1)
+        session.stop()
+    return REGISTRY.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--captures", type=int, default=30)
+    parser.add_argument("--monitors", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--json", metavar="FILE", help="Also write every case's full metrics to FILE")
+    args = parser.parse_args()
+
+    results = []
+    header = "".join(f"{stage:>22}" for stage in STAGES)
+    print(f"{'resolution':>12}{'monitors':>10}{header}")
+    print(f"{'':>22}" + "".join(f"{'p50/p99 ms':>22}" for _ in STAGES))
+    for width, height in RESOLUTIONS:
+        for monitors in args.monitors:
+            snapshot = run_case(width, height, monitors, args.captures, args.workers)
+            results.append({"resolution": f"{width}x{height}", "monitors": monitors, "metrics": snapshot})
+            cells = []
+            for stage in STAGES:
+                stats = snapshot["histograms_ms"].get(stage, {"count": 0})
+                cells.append(f"{stats['p50']:.1f}/{stats['p99']:.1f}" if stats["count"] else "-")
+            print(f"{f'{width}x{height}':>12}{monitors:>10}" + "".join(f"{cell:>22}" for cell in cells), flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
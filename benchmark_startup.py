@@ -0,0 +1,139 @@
+"""Tracks start-up cost: an import-time breakdown and cold start to first capture.
+
+Every run starts a fresh interpreter that imports Loginfo, shows the window
+(offscreen) and takes one screenshot with the synthetic backend; the time from
+launching the process to that screenshot being in the document is reported.
+Usage: python benchmark_startup.py [--runs 5] [--save results.json] [--baseline results.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+# Libraries that must not be imported before the window is shown
+DEFERRED = ("PIL", "docx", "docx2pdf", "openpyxl", "pyautogui", "keyboard", "mss")
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def child_env(home):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", SCREENSHOT_BACKEND="synthetic",
+               HOME=home, USERPROFILE=home)  # No unfinished-session prompts from the user's journals
+    env["PYTHONPATH"] = REPO + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def import_breakdown(top):
+    """[(module, cumulative ms)] for the modules `import Loginfo` loads directly, slowest first."""
+    with tempfile.TemporaryDirectory() as home:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import Loginfo"], cwd=home,
+                                env=child_env(home), capture_output=True, text=True, check=True)
+    modules, children, loaded = [], [], set()
+    # Lines are printed after a module finishes, children first, indented two spaces per level
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        name, cumulative_ms, level = match.group(4), int(match.group(2)) / 1000.0, len(match.group(3)) // 2
+        loaded.add(name.split(".")[0])
+        if level == 1:
+            children.append((name, cumulative_ms))
+        elif level == 0:
+            if name == "Loginfo":
+                modules = children + [("(total) Loginfo", cumulative_ms)]
+            children = []
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return modules[:top], sorted(loaded.intersection(DEFERRED))
+
+
+def run_child():
+    """One cold start; prints timings as JSON."""
+    started = time.perf_counter()
+    import Loginfo
+    from PyQt5.QtWidgets import QApplication
+    imported = time.perf_counter()
+    app = QApplication(sys.argv)
+    window = Loginfo.ScreenshotApp()
+    window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+
+    assembled = []
+    window.capture_assembled.connect(lambda *args: assembled.append(time.perf_counter()))
+    with tempfile.TemporaryDirectory() as folder:
+        window.folder_input.setText(folder)
+        window.session = window.new_session()
+        window.session.start_new()
+        window.capture_enabled = True
+        window.capture_screenshot()
+        while not assembled:
+            app.processEvents()
+            time.sleep(0.001)
+        captured_wall = time.time()
+        window.session.stop()
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "window_ms": (shown - started) * 1000,
+        "first_capture_ms": (assembled[0] - started) * 1000,
+        "captured_wall": captured_wall,
+    }))
+
+
+def run_cold_start():
+    with tempfile.TemporaryDirectory() as home:
+        launched = time.time()
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], cwd=home,
+                                env=child_env(home), capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["cold_start_to_first_capture_ms"] = (timings.pop("captured_wall") - launched) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Modules to show in the import breakdown")
+    parser.add_argument("--save", metavar="FILE", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="Fail if slower than a saved result")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown (default: 0.2 = 20%%)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child()
+        return 0
+
+    modules, deferred = import_breakdown(args.top)
+    print("Import time of `import Loginfo` (cumulative):")
+    for name, ms in modules:
+        print(f"  {name:<30}{ms:>10.1f} ms")
+    if deferred:
+        print(f"WARNING: imported before the window is shown: {', '.join(deferred)}")
+
+    runs = [run_cold_start() for _ in range(args.runs)]
+    results = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    results["deferred_imported"] = deferred
+    print(f"\nMedian of {args.runs} cold starts:")
+    for key in ("import_ms", "window_ms", "first_capture_ms", "cold_start_to_first_capture_ms"):
+        print(f"  {key:<34}{results[key]:>10.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["cold_start_to_first_capture_ms"]
+        limit = baseline * (1 + args.tolerance)
+        if results["cold_start_to_first_capture_ms"] > limit:
+            print(f"REGRESSION: cold start to first capture {results['cold_start_to_first_capture_ms']:.0f} ms "
+                  f"> {limit:.0f} ms (baseline {baseline:.0f} ms)")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Content-addressed image store shared by every session writing to a folder.
+
+Images are kept once, named by the SHA-256 of their bytes, under two levels
+of sharding: <root>/ab/cd/abcd....png. Capturing an image that is already in
+the store only refreshes its modification time, which doubles as "last used"
+for the retention policy. index.json maps each document to the blobs its
+captures use, so blobs of documents that have been deleted can be collected.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+from document_index import file_sha256
+
+BLOB_FOLDER = "image_store"
+GRACE_SECONDS = 600  # Unreferenced blobs this new may belong to a session that has not been saved yet
+_BLOB_NAME = re.compile(r"([0-9a-f]{64})(\.\w+)$")
+
+
+class BlobStore:
+    VERSION = 1
+
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def blob_path(self, sha256, extension):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256 + extension.lower())
+
+    def digest(self, path):
+        """SHA-256 of a blob, taken from its name; None for files outside the store."""
+        match = _BLOB_NAME.search(path)
+        if match and os.path.dirname(os.path.abspath(path)).startswith(os.path.abspath(self.root)):
+            return match.group(1)
+        return None
+
+    def _reuse(self, path):
+        """Marks an existing blob as used now. Returns False if it does not exist."""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def put_file(self, source):
+        """Moves source into the store (or deletes it if the blob exists) and returns the blob path.
+
+        source must be on the same file system as the store, so adding a new blob is a rename.
+        """
+        path = self.blob_path(file_sha256(source), os.path.splitext(source)[1])
+        if self._reuse(path):
+            os.remove(source)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(source, path)
+        return path
+
+    def put_bytes(self, data, extension):
+        """Stores already-encoded image data and returns the blob path; nothing is written for a known blob."""
+        path = self.blob_path(hashlib.sha256(data).hexdigest(), extension)
+        if not self._reuse(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return path
+
+    def blobs(self):
+        """Yields (path, sha256) for every blob in the store."""
+        for shard, _, names in os.walk(self.root):
+            for name in names:
+                match = _BLOB_NAME.fullmatch(name)
+                if match:
+                    yield os.path.join(shard, name), match.group(1)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"version": self.VERSION, "documents": {}}
+
+    def _save_index(self, data):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.index_path)
+
+    def record(self, doc_path, captures, replace=False):
+        """Adds captured_data rows ({"co", "description", "image_path", ...}) to doc_path's references.
+
+        replace drops the references recorded earlier, for a document that was written from scratch.
+        """
+        with self._lock:
+            data = self._load_index()
+            if replace:
+                data["documents"][os.path.abspath(doc_path)] = []
+            entries = data["documents"].setdefault(os.path.abspath(doc_path), [])
+            for capture in captures:
+                sha256 = self.digest(capture["image_path"]) if capture["image_path"] else None
+                if sha256:
+                    entries.append({"co": capture["co"], "description": capture["description"],
+                                    "blob": sha256})
+            self._save_index(data)
+
+    def referenced(self, exclude=None):
+        """SHA-256s used by documents that still exist (other than exclude)."""
+        exclude = os.path.abspath(exclude) if exclude else None
+        with self._lock:
+            documents = self._load_index()["documents"]
+            live = {doc: entries for doc, entries in documents.items() if os.path.exists(doc)}
+            if len(live) != len(documents):
+                self._save_index({"version": self.VERSION, "documents": live})
+        return {entry["blob"] for doc, entries in live.items() if doc != exclude for entry in entries}
+
+    def release(self, paths, doc_path=None, protected=()):
+        """Deletes the given blobs unless another live document or protected path still uses them."""
+        keep = self.referenced(exclude=doc_path)
+        protected = {os.path.abspath(path) for path in protected}
+        removed = 0
+        for path in set(paths):
+            sha256 = self.digest(path)
+            if sha256 is None or sha256 in keep or os.path.abspath(path) in protected:
+                continue
+            removed += self._remove(path)
+        return removed
+
+    def collect(self, keep_days=None, protected=()):
+        """Applies the retention policy. Returns (blobs removed, bytes freed).
+
+        Blobs not used by any existing document are removed once they are
+        GRACE_SECONDS old, and so are blobs not captured for keep_days days
+        (None keeps used blobs forever).
+        Paths in protected (images of sessions awaiting recovery) are kept.
+        """
+        keep = self.referenced()
+        protected = {os.path.abspath(path) for path in protected}
+        now = time.time()
+        cutoff = now - keep_days * 86400 if keep_days is not None else None
+        removed = freed = 0
+        for path, sha256 in list(self.blobs()):
+            if os.path.abspath(path) in protected:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            expired = cutoff is not None and stat.st_mtime < cutoff
+            orphaned = sha256 not in keep and stat.st_mtime < now - GRACE_SECONDS
+            if orphaned or expired:
+                if self._remove(path):
+                    removed += 1
+                    freed += stat.st_size
+        logging.info(f"Image store {self.root}: removed {removed} blob(s), freed {freed / 1048576:.1f} MB")
+        return removed, freed
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            logging.info(f"Deleted image: {path}")
+            return 1
+        except OSError as e:
+            logging.error(f"Error deleting image: {path}: {e}")
+            return 0
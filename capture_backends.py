@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+
+
+class CaptureBackend:
+    """Grabs screen regions as PIL images.
+
+    Regions are (x, y, width, height) in virtual-desktop coordinates, the same
+    tuple pyautogui.screenshot(region=...) takes.
+    """
+
+    name = "base"
+
+    @classmethod
+    def available(cls):
+        return False
+
+    def grab(self, region):
+        raise NotImplementedError
+
+    def monitors(self):
+        """Returns the (x, y, width, height) of every monitor, in screen order."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MssBackend(CaptureBackend):
+    """Shared-memory grabber (XShm on Linux, GDI BitBlt on Windows) via the mss package."""
+
+    name = "mss"
+
+    def __init__(self):
+        import mss
+        self._mss = mss
+        # mss handles are not thread-safe, and the hotkey fires on the keyboard thread
+        self._local = threading.local()
+        self._handles = []  # Every thread's handle, so close() releases them all
+        self._lock = threading.Lock()
+
+    @classmethod
+    def available(cls):
+        try:
+            import mss
+            with mss.mss() as sct:
+                return len(sct.monitors) > 1
+        except Exception:
+            return False
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = self._mss.mss()
+            with self._lock:
+                self._handles.append(sct)
+        return sct
+
+    def grab(self, region):
+        from PIL import Image
+        x, y, width, height = region
+        shot = self._sct().grab({"left": x, "top": y, "width": width, "height": height})
+        return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+
+    def monitors(self):
+        return [(m["left"], m["top"], m["width"], m["height"]) for m in self._sct().monitors[1:]]
+
+    def close(self):
+        """Closes the handles of every thread that grabbed; call once no thread is grabbing any more."""
+        with self._lock:
+            handles, self._handles = self._handles, []
+            self._local = threading.local()
+        for sct in handles:
+            try:
+                sct.close()
+            except Exception as e:
+                logging.warning(f"Error closing mss handle: {e}")
+
+
+class PyAutoGuiBackend(CaptureBackend):
+    """The original pyautogui grabber, kept as the portable fallback."""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    @classmethod
+    def available(cls):
+        try:
+            import pyautogui  # noqa: F401
+            return True
+        except Exception:
+            return False
+
+    def grab(self, region):
+        return self._pyautogui.screenshot(region=region)
+
+    def monitors(self):
+        width, height = self._pyautogui.size()
+        return [(0, 0, width, height)]
+
+
+class SyntheticBackend(CaptureBackend):
+    """In-memory frame source for headless runs and CI; never touches a display."""
+
+    name = "synthetic"
+
+    def __init__(self, monitors=None):
+        self._monitors = list(monitors or [(0, 0, 1920, 1080)])
+        self._frame = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def grab(self, region):
+        from PIL import Image
+        _, _, width, height = region
+        with self._lock:
+            self._frame += 1
+            frame = self._frame
+        # Vary the colour per frame so consecutive grabs are distinguishable
+        color = ((frame * 37) % 256, (frame * 91) % 256, (frame * 173) % 256)
+        return Image.new("RGB", (width, height), color)
+
+    def monitors(self):
+        return list(self._monitors)
+
+
+# Fastest first; the synthetic source is only used when asked for explicitly
+BACKENDS = {backend.name: backend for backend in (MssBackend, PyAutoGuiBackend, SyntheticBackend)}
+AUTO_ORDER = ("mss", "pyautogui")
+
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def select_backend(preferred=None):
+    """Creates the requested backend, or the fastest available one.
+
+    The SCREENSHOT_BACKEND environment variable overrides the automatic choice.
+    """
+    preferred = preferred or os.environ.get("SCREENSHOT_BACKEND")
+    if preferred:
+        if preferred not in BACKENDS:
+            raise ValueError(f"Unknown capture backend: {preferred}")
+        return BACKENDS[preferred]()
+    for name in AUTO_ORDER:
+        if BACKENDS[name].available():
+            logging.info(f"Selected capture backend: {name}")
+            return BACKENDS[name]()
+    logging.warning("No screen capture backend available, falling back to synthetic frames")
+    return SyntheticBackend()
@@ -0,0 +1,181 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from metrics import REGISTRY
+
+
+@dataclass
+class CaptureFrame:
+    """One grabbed image waiting to be encoded and added to the document."""
+    image: object  # Raw image as returned by the grabber
+    image_path: str
+    caption: str  # "(Monitor 1): description"; "Screenshot N " is prefixed once N is known at assembly
+    new_page: bool = False
+    page_break_after: bool = False
+    size: tuple = None  # (width, height), filled in by the encode stage
+    crop_box: tuple = None  # Region of a shared grab that belongs to this frame
+    encode_settings: object = None  # image_encoder.EncodeSettings snapshot taken at grab time
+    encode_result: object = None  # image_encoder.EncodeResult, filled in by the encode stage
+    key: str = ""  # Which monitor/area this frame shows, for duplicate detection
+    previous: object = None  # Previous CaptureFrame with the same key
+    thumb: object = None  # Future with this frame's comparison thumbnail
+    done: object = None  # Future with the EncodeResult this frame ended up using
+    skipped: bool = False  # Unchanged frame that is not added to the document
+    duplicate: bool = False  # Unchanged frame that re-uses the previous image file
+    encoded: bytes = None  # Already-compressed image (recorded frames), written out as-is
+    preview: object = None  # Preview-sized PIL image made from the in-memory pixels
+    thumbnail: object = None  # Strip-sized PIL image
+    error: str = ""  # Why encoding failed; the frame is still assembled so the gap is visible
+
+
+@dataclass
+class CaptureJob:
+    """All frames produced by a single hotkey press."""
+    co: int  # Screenshot number; provisional until the job is assembled
+    description: str
+    frames: list = field(default_factory=list)
+    increment: int = 0  # How far the screenshot number advances once this job is in the document
+    hotkey_time: float = 0.0
+    grab_time: float = 0.0
+    enqueue_time: float = 0.0
+
+
+class StageLatency:
+    """Keeps a rolling window of latency samples (milliseconds) per pipeline stage."""
+
+    def __init__(self, max_samples=1000):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, elapsed_ms):
+        REGISTRY.observe(f"pipeline_{stage}", elapsed_ms)
+        with self._lock:
+            samples = self._samples.setdefault(stage, [])
+            samples.append(elapsed_ms)
+            if len(samples) > self.max_samples:
+                del samples[0]
+
+    def summary(self):
+        with self._lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self._samples.items()}
+        result = {}
+        for stage, samples in snapshot.items():
+            if not samples:
+                continue
+            result[stage] = {
+                "count": len(samples),
+                "mean": sum(samples) / len(samples),
+                "p50": samples[len(samples) // 2],
+                "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                "max": samples[-1],
+            }
+        return result
+
+    def report(self):
+        lines = []
+        for stage, stats in self.summary().items():
+            lines.append(f"{stage}: n={stats['count']} mean={stats['mean']:.1f}ms "
+                         f"p50={stats['p50']:.1f}ms p95={stats['p95']:.1f}ms max={stats['max']:.1f}ms")
+        return "\n".join(lines)
+
+
+class CapturePipeline:
+    """Producer/consumer pipeline between the hotkey and the document.
+
+    The hotkey thread only grabs pixels and calls submit(). Encoding runs on a
+    worker pool and assembly runs on a single thread in submission order, so the
+    document always receives screenshots in the order the hotkey was pressed.
+    """
+
+    BLOCK = "block"
+    DROP = "drop"
+
+    def __init__(self, encode, assemble, queue_depth=8, policy=BLOCK, workers=2):
+        self._encode = encode  # encode(frame), called on a worker thread
+        self._assemble = assemble  # assemble(job), called in order on the assembler thread
+        self.queue_depth = queue_depth
+        self.policy = policy
+        self.latency = StageLatency()
+        self.dropped = 0
+        self._slots = threading.BoundedSemaphore(queue_depth)
+        self._ordered = queue.Queue()
+        self._in_flight = 0
+        self._idle = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="capture-encode")
+        self._assembler = threading.Thread(target=self._assemble_loop, name="capture-assemble", daemon=True)
+        self._assembler.start()
+
+    def submit(self, job):
+        """Queues a grabbed job. Returns False if it was dropped because the queue is full.
+
+        Under the BLOCK policy the hotkey thread waits here for a free slot, and
+        later presses wait behind it; that wait is recorded as "backpressure".
+        """
+        start = time.perf_counter()
+        acquired = self._slots.acquire(blocking=self.policy == self.BLOCK)
+        self.latency.record("backpressure", (time.perf_counter() - start) * 1000)
+        if not acquired:
+            self.dropped += 1
+            REGISTRY.count("captures_dropped")
+            logging.warning(f"Capture queue full ({self.queue_depth}), dropped screenshot {job.co}")
+            return False
+        job.enqueue_time = time.perf_counter()
+        if job.hotkey_time and job.grab_time:
+            self.latency.record("grab", (job.grab_time - job.hotkey_time) * 1000)
+        with self._idle:
+            self._in_flight += 1
+        futures = [self._executor.submit(self._timed_encode, job, frame) for frame in job.frames]
+        self._ordered.put((job, futures))
+        return True
+
+    def _timed_encode(self, job, frame):
+        start = time.perf_counter()
+        self.latency.record("queue", (start - job.enqueue_time) * 1000)
+        self._encode(frame)
+        self.latency.record("encode", (time.perf_counter() - start) * 1000)
+
+    def _assemble_loop(self):
+        while True:
+            item = self._ordered.get()
+            if item is None:
+                break
+            job, futures = item
+            for frame, future in zip(job.frames, futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Error encoding screenshot {frame.image_path}: {e}")
+                    frame.error = str(e) or e.__class__.__name__
+            start = time.perf_counter()
+            try:
+                self._assemble(job)
+            except Exception as e:
+                logging.error(f"Error assembling screenshot {job.co}: {e}")
+            end = time.perf_counter()
+            self.latency.record("assemble", (end - start) * 1000)
+            if job.hotkey_time:
+                self.latency.record("total", (end - job.hotkey_time) * 1000)
+            self._slots.release()
+            with self._idle:
+                self._in_flight -= 1
+                self._idle.notify_all()
+
+    def pending(self):
+        with self._idle:
+            return self._in_flight
+
+    def flush(self, timeout=None):
+        """Waits until every submitted job has been assembled. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def shutdown(self):
+        self.flush()
+        self._ordered.put(None)
+        self._assembler.join()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,130 @@
+"""Capture areas smaller than a monitor: saved regions, per-test-case selections and the active window.
+
+Rectangles are (x, y, width, height) in physical pixels, like monitor
+rectangles, so they are grabbed by the same backends and pipeline. Grab and
+encode cost then follow the area's size rather than the number of monitors.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+
+from capture_session import CaptureTarget
+
+REGIONS_FILE = os.path.join(os.path.expanduser("~"), ".screenshot_tool", "regions.json")
+MIN_SIZE = 8  # Smaller drags are treated as accidental clicks
+
+
+def region_key(name):
+    return "region_" + (re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").lower() or "unnamed")
+
+
+def region_target(name, rect):
+    return CaptureTarget(f"Region {name}", region_key(name), tuple(rect))
+
+
+def window_target(rect, title=""):
+    label = f"Window: {title[:60]}" if title else "Active Window"
+    return CaptureTarget(label, "active_window", tuple(rect))
+
+
+class RegionStore:
+    """Named regions, plus the last region selected for each test case, kept in REGIONS_FILE."""
+
+    def __init__(self, path=REGIONS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {"regions": dict(data.get("regions", {})), "cases": dict(data.get("cases", {}))}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logging.error(f"Error reading saved regions {self.path}: {e}")
+        return {"regions": {}, "cases": {}}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def names(self):
+        with self._lock:
+            return sorted(self._data["regions"])
+
+    def get(self, name):
+        with self._lock:
+            rect = self._data["regions"].get(name)
+        return tuple(rect) if rect else None
+
+    def save_region(self, name, rect):
+        with self._lock:
+            self._data["regions"][name] = list(rect)
+            self._save()
+        logging.info(f"Saved region {name}: {tuple(rect)}")
+
+    def delete_region(self, name):
+        with self._lock:
+            if self._data["regions"].pop(name, None) is not None:
+                self._save()
+        logging.info(f"Deleted region {name}")
+
+    def case_region(self, case_name):
+        with self._lock:
+            rect = self._data["cases"].get(case_name)
+        return tuple(rect) if rect else None
+
+    def set_case_region(self, case_name, rect):
+        with self._lock:
+            self._data["cases"][case_name] = list(rect)
+            self._save()
+        logging.info(f"Selected region for {case_name}: {tuple(rect)}")
+
+
+def active_window():
+    """(rect, title) of the foreground window in physical pixels, or None if it cannot be found."""
+    try:
+        if sys.platform == "win32":
+            return _active_window_win32()
+        if shutil.which("xdotool"):
+            return _active_window_xdotool()
+    except Exception as e:
+        logging.error(f"Error finding the active window: {e}")
+    return None
+
+
+def _active_window_win32():
+    import ctypes
+    from ctypes import wintypes
+    user32 = ctypes.windll.user32
+    hwnd = user32.GetForegroundWindow()
+    if not hwnd:
+        return None
+    rect = wintypes.RECT()
+    # The DWM frame bounds exclude the invisible resize borders GetWindowRect includes
+    DWMWA_EXTENDED_FRAME_BOUNDS = 9
+    if ctypes.windll.dwmapi.DwmGetWindowAttribute(hwnd, DWMWA_EXTENDED_FRAME_BOUNDS, ctypes.byref(rect),
+                                                  ctypes.sizeof(rect)) != 0:
+        user32.GetWindowRect(hwnd, ctypes.byref(rect))
+    length = user32.GetWindowTextLengthW(hwnd)
+    title = ctypes.create_unicode_buffer(length + 1)
+    user32.GetWindowTextW(hwnd, title, length + 1)
+    return (rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top), title.value
+
+
+def _active_window_xdotool():
+    output = subprocess.run(["xdotool", "getactivewindow", "getwindowgeometry", "--shell", "getwindowname"],
+                            capture_output=True, text=True, timeout=1, check=True).stdout.splitlines()
+    geometry = dict(line.split("=", 1) for line in output[:-1] if "=" in line)
+    rect = tuple(int(geometry[key]) for key in ("X", "Y", "WIDTH", "HEIGHT"))
+    return rect, output[-1] if output else ""
@@ -0,0 +1,615 @@
+"""Capture and document assembly, independent of any GUI.
+
+ScreenshotApp and the command line both drive a CaptureSession: open a new or
+existing document, call capture() with the screen areas to grab, then stop().
+"""
+import datetime
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+from blob_store import BLOB_FOLDER, BlobStore
+from capture_pipeline import CaptureFrame, CaptureJob, CapturePipeline
+from docx_writer import EMU_PER_INCH, PythonDocxDocument, StreamingDocxWriter, restore_last_checkpoint
+from document_index import DocumentIndex
+from excel_export import export_excel
+from frame_dedupe import DuplicateDetector
+from frame_recorder import FrameRecorder
+from image_encoder import FORMATS, WORD_DISPLAY_INCHES, EncodeSettings, display_width_px, encode_image
+from metrics import count, span
+from monitor_layout import crop_box, plan_grabs, union_rect
+from preview_cache import STRIP_SIZE, PreviewCache, make_preview, preview_from_bytes
+from session_journal import (JOURNAL_SUFFIX, SessionJournal, discard_journal, journal_images, lock_journal,
+                             read_journal, unlock_journal)
+
+
+@dataclass
+class CaptureTarget:
+    """One screen area to grab on every capture."""
+    label: str  # Shown in the caption, e.g. "Monitor 1"
+    key: str  # File name suffix and duplicate-detection key, e.g. "monitor_1"
+    rect: tuple  # (x, y, width, height)
+
+
+def monitor_targets(monitor_rects, indices):
+    return [CaptureTarget(f"Monitor {index + 1}", f"monitor_{index + 1}", monitor_rects[index])
+            for index in indices if 0 <= index < len(monitor_rects)]
+
+
+def all_monitors_target(monitor_rects):
+    return CaptureTarget("All Monitors", "all_monitors", union_rect(monitor_rects))
+
+
+def reserve_path(path):
+    """Creates an empty file at path, or at path with _2, _3... before the extension if that name is taken.
+
+    Returns the name created, so frames encoded in parallel never write to the same file.
+    """
+    base, extension = os.path.splitext(path)
+    for number in itertools.count(1):
+        candidate = path if number == 1 else f"{base}_{number}{extension}"
+        try:
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+            return candidate
+        except FileExistsError:
+            continue
+
+
+@dataclass
+class SessionSettings:
+    """Everything a capture session needs to know.
+
+    Document and pipeline settings are read when the session starts; the rest
+    may be replaced between captures.
+    """
+    folder: str
+    case_name: str = "Evidence"
+    version: str = "v1"
+    add_timestamp: bool = False
+    auto_increment: bool = False
+    increment_by: int = 1
+    single_grab: bool = True
+    encode: EncodeSettings = field(default_factory=EncodeSettings)
+    stream_document: bool = True
+    checkpoint_every: int = 10
+    queue_depth: int = 8
+    queue_policy: str = CapturePipeline.BLOCK
+    workers: int = 2
+    dedupe_mode: str = DuplicateDetector.KEEP
+    dedupe_max_area: int = 16  # Changed areas up to this many pixels still count as unchanged
+    delete_images_after_save: bool = False
+    journal: bool = True  # Keep a crash-recovery journal next to the document
+    blob_store: bool = True  # Keep images once each in <folder>/image_store, named by content hash
+    keep_images_days: int = None  # Image store retention after each save; None keeps images in use
+
+
+class CaptureSession:
+    """One evidence document being captured into.
+
+    on_captured(image_path, message, encode_info) is called from the pipeline's
+    assembler thread after every capture has been added to the document, and
+    on_preview(capture_id, image) with a preview-sized PIL image of its last frame.
+    """
+
+    def __init__(self, backend, settings, on_captured=None, on_preview=None):
+        self.backend = backend
+        self.settings = settings
+        self.on_captured = on_captured
+        self.on_preview = on_preview
+        self.doc_path = None
+        self.excel_path = None
+        self.doc = None
+        self.new_document = False
+        self.screenshot_count = 1  # Next number handed out at capture time
+        self.document_number = 1  # Next number in the document; captures that add nothing give theirs back
+        self.captured_data = []  # To store data for Excel
+        self.captured_images = []  # To keep track of captured image paths
+        self.pipeline = None
+        self.detector = DuplicateDetector()
+        self.recorder = None  # FrameRecorder while recording continuously
+        self.previews = PreviewCache()  # Strip thumbnails by capture id (row in captured_data)
+        self.journal = None  # SessionJournal until the document has been saved
+        self.store = None  # BlobStore when settings.blob_store is on
+
+    def start_new(self, doc_path=None):
+        folder = self.settings.folder
+        case_name = self.settings.case_name or "Evidence"
+        version = self.settings.version or "v1"
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.doc_path = doc_path or os.path.join(folder, f"{case_name}_{version}.docx")
+        self.excel_path = os.path.splitext(self.doc_path)[0] + ".xlsx"
+        if self.settings.stream_document:
+            self.doc = StreamingDocxWriter(self.doc_path, checkpoint_every=self.settings.checkpoint_every)
+        else:
+            self.doc = PythonDocxDocument(self.doc_path)
+        self.new_document = True
+        self.screenshot_count = self.document_number = 1
+        self._start()
+        logging.info(f"Started new capture. Document path: {self.doc_path}, Excel path: {self.excel_path}")
+
+    def append(self, doc_path):
+        self.doc_path = doc_path
+        self.excel_path = os.path.splitext(doc_path)[0] + ".xlsx"
+        restore_last_checkpoint(doc_path)
+        index = DocumentIndex.load(doc_path)
+        self.doc = None
+        if index is not None and index.streaming:
+            # Resume in place: the existing images are not re-read or rewritten
+            try:
+                self.doc = StreamingDocxWriter(doc_path, checkpoint_every=self.settings.checkpoint_every,
+                                               existing=True, index=index)
+            except (KeyError, ValueError) as e:
+                logging.warning(f"Cannot resume {doc_path} in place, loading it instead: {e}")
+        if self.doc is None:
+            self.doc = PythonDocxDocument(doc_path, existing=True)
+        self.new_document = False
+        self.screenshot_count = self.document_number = self.doc.index.next_number
+        self._start()
+        logging.info(f"Appending to existing document: {doc_path}")
+
+    def _start(self):
+        self.captured_data = []
+        self.captured_images = []
+        self.previews = PreviewCache()
+        if self.settings.blob_store:
+            self.store = BlobStore(os.path.join(self.settings.folder, BLOB_FOLDER))
+        if self.settings.journal:
+            try:
+                self.journal = SessionJournal(self.doc_path, {
+                    "doc_path": self.doc_path,
+                    "excel_path": self.excel_path,
+                    "append": not self.new_document,
+                    "base_entries": len(self.doc.index.entries),
+                    "folder": self.settings.folder,
+                    "case_name": self.settings.case_name,
+                    "version": self.settings.version,
+                    "stream_document": isinstance(self.doc, StreamingDocxWriter),
+                    "checkpoint_every": self.settings.checkpoint_every,
+                    "delete_images_after_save": self.settings.delete_images_after_save,
+                    "blob_store": self.store is not None,
+                    "keep_images_days": self.settings.keep_images_days,
+                })
+            except OSError as e:
+                self.journal = None
+                logging.error(f"Could not start session journal, capturing without one: {e}")
+        self.detector = DuplicateDetector(self.settings.dedupe_mode, max_area=self.settings.dedupe_max_area)
+        self.pipeline = CapturePipeline(self._encode_frame, self._assemble_job,
+                                        queue_depth=self.settings.queue_depth,
+                                        policy=self.settings.queue_policy,
+                                        workers=self.settings.workers)
+        logging.info(f"Capture pipeline started (depth={self.pipeline.queue_depth}, "
+                     f"policy={self.pipeline.policy})")
+
+    @property
+    def active(self):
+        return self.pipeline is not None
+
+    def capture(self, targets, description="", new_pages=False):
+        """Grabs targets and queues them for the document. Returns False if the capture was dropped.
+
+        With new_pages, every target starts a new page (the "multiple monitors" layout).
+        """
+        if not self.active or not targets:
+            return False
+        hotkey_time = time.perf_counter()
+        settings = self.settings
+
+        folder = settings.folder
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        case_name = settings.case_name or "Evidence"
+        co = self.screenshot_count  # Capture current count for Excel
+        if settings.add_timestamp:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            description += f"_{timestamp}"
+
+        filename_base = f"{case_name}_{self.screenshot_count}_{description}".replace(" ", "_")
+        job = CaptureJob(co=co, description=description, hotkey_time=hotkey_time,
+                         increment=settings.increment_by if settings.auto_increment else 0)
+
+        rects = [target.rect for target in targets]
+        if settings.single_grab:
+            # One grab per group of adjacent areas, so all images come from the same instant
+            grabs = plan_grabs(rects)
+        else:
+            grabs = [(rect, [i]) for i, rect in enumerate(rects)]
+        crops = {}
+        for grab_rect, members in grabs:
+            screenshot = self.backend.grab(grab_rect)  # Timed by the pipeline as pipeline_grab
+            for i in members:
+                box = None if len(members) == 1 else crop_box(rects[i], grab_rect)
+                crops[i] = (screenshot, box)
+        for i, target in enumerate(targets):
+            screenshot, box = crops[i]
+            image_path = os.path.join(folder, f"{filename_base}_{target.key}.png")
+            job.frames.append(CaptureFrame(
+                screenshot, image_path,
+                f"({target.label}): {description}",
+                new_page=new_pages,
+                page_break_after=new_pages and len(targets) > 1 and i < len(targets) - 1,
+                crop_box=box, key=target.key, encode_settings=settings.encode))
+
+        job.grab_time = time.perf_counter()
+        for frame in job.frames:
+            self.detector.link(frame, frame.key)
+        if not self.pipeline.submit(job):
+            for frame in job.frames:
+                self.detector.finish(frame, None)  # Keep the duplicate-detection chain moving
+            return False
+
+        count("captures")
+        if settings.auto_increment:
+            self.screenshot_count += settings.increment_by
+        return True
+
+    def start_recording(self, targets, fps=2.0, seconds=30.0, max_megabytes=256):
+        """Records targets continuously, keeping the last seconds (at most max_megabytes) in memory."""
+        self.stop_recording()
+        encode = self.settings.encode
+        self.recorder = FrameRecorder(self.backend, targets, fps=fps, max_bytes=max_megabytes * 1024 * 1024,
+                                      max_seconds=seconds, fmt="jpeg", quality=encode.jpeg_quality,
+                                      max_width=display_width_px(encode) if encode.downscale else None,
+                                      workers=self.settings.workers)
+        self.recorder.start()
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
+
+    def save_recording(self, seconds, description=""):
+        """Queues the last seconds of the recording for the document as one numbered capture.
+
+        Returns the number of frames queued (0 if there was nothing to save or the capture was dropped).
+        """
+        frames = self.recorder.last(seconds) if self.recorder is not None else []
+        if not self.active or not frames:
+            return 0
+        folder = self.settings.folder
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        case_name = self.settings.case_name or "Evidence"
+        co = self.screenshot_count
+        filename_base = f"{case_name}_{co}_{description}".replace(" ", "_")
+        end = frames[-1].timestamp
+        job = CaptureJob(co=co, description=description, hotkey_time=time.perf_counter(),
+                         increment=self.settings.increment_by if self.settings.auto_increment else 0)
+        for i, recorded in enumerate(frames):
+            image_path = os.path.join(folder, f"{filename_base}_{recorded.target.key}_rec{i + 1:03d}"
+                                              f"{recorded.extension}")
+            job.frames.append(CaptureFrame(
+                None, image_path,
+                f"({recorded.target.label}, -{end - recorded.timestamp:.1f}s): {description}",
+                size=recorded.size, key=recorded.target.key, encoded=recorded.data))
+        job.grab_time = time.perf_counter()
+        if not self.pipeline.submit(job):
+            return 0
+        count("recorded_frames_saved", len(frames))
+
+        if self.settings.auto_increment:
+            self.screenshot_count += self.settings.increment_by
+        return len(frames)
+
+    def _encode_frame(self, frame):
+        """Pipeline encode stage (worker thread): drops unchanged frames, then downscales and encodes to disk."""
+        if frame.encoded is not None:
+            if self.store is not None:
+                frame.image_path = self.store.put_bytes(frame.encoded, os.path.splitext(frame.image_path)[1])
+            else:
+                frame.image_path = reserve_path(frame.image_path)
+                with open(frame.image_path, "wb") as f:
+                    f.write(frame.encoded)
+            frame.preview = preview_from_bytes(frame.encoded)
+            frame.thumbnail = make_preview(frame.preview, STRIP_SIZE)
+            frame.encoded = None
+            return
+        result = None
+        try:
+            image = frame.image
+            frame.image = None  # Release the raw pixels as soon as this stage is done with them
+            if frame.crop_box is not None:
+                # Materialise this area's view of the shared grab off the hotkey thread
+                image = image.crop(frame.crop_box)
+            action, grabbed = DuplicateDetector.KEEP, image
+            if frame.thumb is not None:
+                action, image = self.detector.decide(frame, image)
+            if action in (DuplicateDetector.SKIP, DuplicateDetector.REFERENCE):
+                result = frame.previous.done.result()
+                if result is not None:
+                    self.detector.record(action, result.encoded_bytes)
+                    count(f"frames_{action}")
+                    if action == DuplicateDetector.SKIP:
+                        frame.skipped = True
+                    else:
+                        frame.duplicate = True
+                        frame.image_path = result.path
+                        frame.size = result.size
+                        frame.preview, frame.thumbnail = frame.previous.preview, frame.previous.thumbnail
+                    logging.info(f"Unchanged screen, {action} {frame.image_path}")
+                    return
+                # Nothing to refer back to (the previous frame failed), so encode after all
+                action, image = DuplicateDetector.KEEP, grabbed
+            if action == DuplicateDetector.CROP:
+                frame.caption += " (changed area)"
+            # Preview the whole area from memory so the GUI never re-reads the file
+            frame.preview = make_preview(grabbed)
+            frame.thumbnail = make_preview(frame.preview, STRIP_SIZE)
+            settings = frame.encode_settings or EncodeSettings()
+            # The name is only unique once reserved; it already carries the extension encode_image will use
+            frame.image_path = reserve_path(os.path.splitext(frame.image_path)[0]
+                                            + FORMATS.get(settings.format, FORMATS["png"]))
+            try:
+                result = encode_image(image, frame.image_path, settings)  # Timed as pipeline_encode
+            except Exception:
+                os.remove(frame.image_path)
+                raise
+            if self.store is not None:
+                result.path = self.store.put_file(result.path)
+            frame.image_path = result.path
+            frame.size = result.size
+            frame.encode_result = result
+        finally:
+            if frame.thumb is not None:
+                self.detector.finish(frame, result)
+
+    def _assemble_job(self, job):
+        """Pipeline assembly stage (assembler thread): adds encoded frames to the document in order."""
+        skipped = [frame for frame in job.frames if frame.skipped]
+        job.frames = [frame for frame in job.frames if not frame.skipped]
+        if skipped and not job.frames:
+            # The number goes to the next capture that is added, so the document has no gaps
+            self._notify("", "Screen unchanged, not added to document.", "")
+            return
+        job.co = self.document_number
+        self.document_number += job.increment
+        for frame in job.frames:
+            frame.caption = f"Screenshot {job.co} {frame.caption}"
+        failed = 0
+        for frame in job.frames:
+            if frame.error:
+                # Leave a note in the document and report instead of a silent gap in the evidence
+                failed += 1
+                count("frames_failed")
+                self.add_failed(frame, job)
+                continue
+            self.add_to_word(frame.image_path, frame.caption, new_page=frame.new_page, image_size=frame.size,
+                             number=job.co, short_description=job.description)
+            if not frame.duplicate:
+                self.captured_images.append(frame.image_path)
+            capture_id = len(self.captured_data)
+            if frame.thumbnail is not None:
+                self.previews.put(capture_id, frame.caption, frame.thumbnail)
+            self.captured_data.append({"co": job.co, "description": job.description,
+                                       "image_path": frame.image_path, "size": frame.size})
+            if frame.page_break_after:
+                self.doc.add_page_break()
+            if self.journal is not None:
+                elapsed_ms = self.journal.record(
+                    co=job.co, description=job.description, caption=frame.caption, image=frame.image_path,
+                    size=frame.size, new_page=frame.new_page, page_break_after=frame.page_break_after,
+                    duplicate=frame.duplicate)
+                self.pipeline.latency.record("journal", elapsed_ms)
+            logging.info(f"Screenshot captured: {frame.image_path}")
+        if job.frames:
+            results = [frame.encode_result for frame in job.frames if frame.encode_result]
+            raw = sum(r.raw_bytes for r in results)
+            encoded = sum(r.encoded_bytes for r in results)
+            encode_info = ""
+            if results:
+                encode_info = (f"Last shot: {raw / 1048576:.1f} MB raw -> {encoded / 1024:.0f} KB "
+                               f"({100.0 * (1 - encoded / float(raw)):.0f}% saved), "
+                               f"encode {sum(r.encode_ms for r in results):.0f} ms")
+                logging.info(encode_info)
+            message = f"Screenshot {job.co} captured and added to document."
+            if failed:
+                message = f"Screenshot {job.co}: {failed} image(s) could not be saved; see the log."
+            self._notify(job.frames[-1].image_path, message, encode_info)
+            preview = job.frames[-1].preview
+            if self.on_preview is not None and preview is not None:
+                self.on_preview(len(self.captured_data) - 1, preview)
+
+    def add_failed(self, frame, job):
+        """Adds the caption and the encode error of a frame whose image could not be saved."""
+        if frame.new_page and not self.doc.is_empty():
+            self.doc.add_page_break()
+        self.doc.add_paragraph(frame.caption)
+        self.doc.add_paragraph(f"Error saving screenshot image: {frame.error}")
+        self.doc.add_paragraph("")
+        self.captured_data.append({"co": job.co, "description": job.description, "image_path": None,
+                                   "size": None, "error": frame.error})
+        if frame.page_break_after:
+            self.doc.add_page_break()
+
+    def _notify(self, image_path, message, encode_info):
+        if self.on_captured is not None:
+            self.on_captured(image_path, message, encode_info)
+
+    def add_to_word(self, image_path, description, new_page=False, image_size=None, number=None,
+                    short_description=""):
+        with span("add_to_word"):
+            if new_page and not self.doc.is_empty():
+                self.doc.add_page_break()
+
+            self.doc.add_paragraph(description)
+
+            try:
+                # Calculate available width (adjust margins as needed)
+                available_width = WORD_DISPLAY_INCHES * EMU_PER_INCH
+                if image_size is None:
+                    from PIL import Image
+                    image_size = Image.open(image_path).size
+                img_width_px, img_height_px = image_size
+                aspect_ratio = img_height_px / img_width_px
+                scaled_width = available_width
+                scaled_height = scaled_width * aspect_ratio
+                self.doc.add_picture(image_path, scaled_width, scaled_height, number=number,
+                                     description=short_description,
+                                     sha256=self.store.digest(image_path) if self.store else None)
+                logging.info(f"Added image to Word document: {image_path}")
+            except Exception as e:
+                error_message = f"Error adding image to Word document: {e}"
+                self.doc.add_paragraph(error_message)
+                logging.error(error_message)
+
+            self.doc.add_paragraph("")  # Add a blank line for spacing
+
+    def stop(self):
+        """Drains queued captures, saves the document and stops the pipeline. Returns the saved path."""
+        self.stop_recording()
+        if self.pipeline is not None:
+            self.pipeline.shutdown()
+            report = self.pipeline.latency.report()
+            if report:
+                logging.info(f"Capture pipeline latency:\n{report}")
+            if self.pipeline.dropped:
+                logging.warning(f"Capture pipeline dropped {self.pipeline.dropped} screenshot(s)")
+            self.detector.log_report()
+            self.pipeline = None
+        if self.doc is None or not self.doc_path:
+            return None
+        with span("save"):
+            self.doc.save()
+        if self.journal is not None:
+            self.journal.close(finished=True)
+            self.journal = None
+        if self.store is not None:
+            # A new document overwrote any earlier one of that name, so its references go too
+            self.store.record(self.doc_path, self.captured_data, replace=self.new_document)
+            if self.settings.keep_images_days is not None:
+                self.store.collect(self.settings.keep_images_days, protected=journal_images())
+        logging.info(f"Capture complete. Word document saved to: {self.doc_path}")
+        return self.doc_path
+
+    def export_excel(self, progress=None):
+        """Writes the Excel report for this session's captures. Returns the rows that failed."""
+        return export_excel(list(self.captured_data), self.excel_path, progress=progress)
+
+    def cleanup_captured_images(self, images=None):
+        if self.store is not None:
+            # Images shared with other documents in the store are kept
+            self.store.release(self.captured_images if images is None else images, doc_path=self.doc_path,
+                               protected=journal_images())
+            if images is None:
+                self.captured_images = []
+            return
+        for img_path in self.captured_images if images is None else images:
+            try:
+                os.remove(img_path)
+                logging.info(f"Deleted image: {img_path}")
+            except Exception as e:
+                logging.error(f"Error deleting image: {img_path}: {e}")
+        if images is None:
+            self.captured_images = []
+
+
+@dataclass
+class RecoveredSession:
+    journal_path: str
+    doc_path: str = None
+    excel_path: str = None
+    captures: int = 0  # Captures written to the document by the recovery
+    missing: int = 0  # Captures whose image file no longer exists
+    error: str = ""
+    warning: str = ""  # Recovered, but something of the original session was lost
+
+    def summary(self):
+        if self.error:
+            return f"Could not recover {self.journal_path}: {self.error}"
+        message = f"Recovered {self.captures} screenshot(s) into {self.doc_path}"
+        if self.missing:
+            message += f" ({self.missing} image file(s) missing)"
+        if self.warning:
+            message += f". Warning: {self.warning}"
+        return message
+
+
+def recover_session(journal_path, export_excel=True):
+    """Rebuilds the document (and Excel report) of an unfinished session from its journal.
+
+    A new document is rebuilt from scratch. When the session was appending, the
+    document is reopened and only the captures missing from it are added; if it
+    cannot be opened, this session's captures go to <name>_recovered.docx instead
+    and the result carries a warning that the original document was lost.
+    A journal that was set aside because a later session reused the document
+    is rebuilt into <name>_recovered_<start time>.docx, leaving that document alone.
+    The journal stays locked while it is recovered, so a session that is still
+    running, or a second recovery of the same journal, is refused.
+    """
+    result = RecoveredSession(journal_path)
+    owner_lock = lock_journal(journal_path)
+    if owner_lock is None:
+        result.error = "the session is still running or already being recovered"
+        logging.error(result.summary())
+        return result
+    try:
+        header, records = read_journal(journal_path)
+        settings = SessionSettings(
+            folder=header["folder"], case_name=header["case_name"], version=header["version"],
+            stream_document=header["stream_document"], checkpoint_every=header["checkpoint_every"],
+            delete_images_after_save=header["delete_images_after_save"], journal=False,
+            blob_store=header.get("blob_store", False), keep_images_days=header.get("keep_images_days"))
+        session = CaptureSession(None, settings)
+        present = 0
+        base = os.path.splitext(header["doc_path"])[0]
+        if os.path.abspath(journal_path) != os.path.abspath(header["doc_path"] + JOURNAL_SUFFIX):
+            # Set aside when a later session started over the same document; recover next to it instead
+            session.start_new(f"{base}_recovered_{int(header['started'])}.docx")
+            if header["append"]:
+                result.warning = (f"{header['doc_path']} was reused by a later session, so only this session's "
+                                  f"captures were recovered, into a separate document")
+        elif header["append"]:
+            try:
+                session.append(header["doc_path"])
+                present = max(0, len(session.doc.index.entries) - header["base_entries"])
+            except Exception as e:
+                logging.error(f"Cannot reopen {header['doc_path']} for recovery: {e}")
+                session.start_new(base + "_recovered.docx")
+                result.warning = (f"the original document {header['doc_path']} could not be opened ({e}); "
+                                  f"its earlier screenshots are lost and only this session's captures were "
+                                  f"recovered")
+        else:
+            session.start_new(header["doc_path"])
+
+        for number, record in enumerate(records):
+            image_path = record["image"]
+            exists = os.path.exists(image_path)
+            size = tuple(record["size"]) if record.get("size") else None
+            if number >= present:
+                if not exists:
+                    result.missing += 1
+                session.add_to_word(image_path, record["caption"], new_page=record["new_page"], image_size=size,
+                                    number=record["co"], short_description=record["description"])
+                if record["page_break_after"]:
+                    session.doc.add_page_break()
+                result.captures += 1
+            if exists:
+                session.captured_data.append({"co": record["co"], "description": record["description"],
+                                              "image_path": image_path, "size": size})
+                if not record["duplicate"]:
+                    session.captured_images.append(image_path)
+        result.doc_path = session.stop()
+
+        if export_excel and session.captured_data:
+            session.export_excel()
+            result.excel_path = session.excel_path
+        if settings.delete_images_after_save:
+            session.cleanup_captured_images()
+        unlock_journal(owner_lock)
+        owner_lock = None
+        discard_journal(journal_path)
+        if result.warning:
+            logging.warning(result.summary())
+        else:
+            logging.info(result.summary())
+    except Exception as e:
+        result.error = str(e) or e.__class__.__name__
+        logging.error(result.summary())
+    finally:
+        if owner_lock is not None:
+            unlock_journal(owner_lock)
+    return result
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import logging
+import os
+import re
+
+_CAPTION_NUMBER = re.compile(r"Screenshot (\d+)")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def last_screenshot_number(paragraph_texts):
+    """Number of the last "Screenshot N ..." caption, skipping spacer and error paragraphs."""
+    for text in reversed(paragraph_texts):
+        match = _CAPTION_NUMBER.search(text)
+        if match:
+            return int(match.group(1))
+    return 0
+
+
+class DocumentIndex:
+    """Sidecar index (<document>.index.json) describing the screenshots in a .docx.
+
+    It records each screenshot's number, description, image hash and position in
+    the package, and is rewritten whenever the document is saved. The size and
+    mtime of the document are stored with it, so an index is ignored as soon as
+    the .docx has been edited by anything else.
+    """
+
+    VERSION = 1
+
+    def __init__(self, doc_path, streaming=False):
+        self.doc_path = doc_path
+        self.path = doc_path + ".index.json"
+        self.streaming = streaming  # True when the package layout is StreamingDocxWriter's
+        self.entries = []
+        self.next_number = 1
+
+    @classmethod
+    def load(cls, doc_path):
+        """Returns the index for doc_path, or None if it is missing or out of date."""
+        index = cls(doc_path)
+        try:
+            with open(index.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            stat = os.stat(doc_path)
+        except (OSError, ValueError):
+            return None
+        if (data.get("version") != cls.VERSION or data.get("doc_size") != stat.st_size
+                or data.get("doc_mtime_ns") != stat.st_mtime_ns):
+            logging.info(f"Ignoring stale document index: {index.path}")
+            return None
+        index.streaming = data["streaming"]
+        index.entries = data["entries"]
+        index.next_number = data["next_number"]
+        return index
+
+    def add(self, number, description, image_path, part=None, offset=None, sha256=None):
+        self.entries.append({
+            "number": number,
+            "description": description,
+            "sha256": sha256 or file_sha256(image_path),
+            "part": part,
+            "offset": offset,
+        })
+        if number is not None:
+            self.next_number = number + 1
+
+    def save(self):
+        stat = os.stat(self.doc_path)
+        data = {
+            "version": self.VERSION,
+            "doc_size": stat.st_size,
+            "doc_mtime_ns": stat.st_mtime_ns,
+            "streaming": self.streaming,
+            "next_number": self.next_number,
+            "entries": self.entries,
+        }
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,390 @@
+"""Document backends used to assemble the Word evidence file.
+
+PythonDocxDocument keeps the whole python-docx Document in memory until save()
+and is used when appending to an existing file. StreamingDocxWriter appends
+images to the .docx package at every checkpoint and only keeps the body XML on
+disk, so memory stays flat no matter how long the session runs.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+from document_index import DocumentIndex, file_sha256, last_screenshot_number
+from metrics import span
+
+EMU_PER_INCH = 914400
+
+_CONTENT_TYPES_PART = "[Content_Types].xml"
+_PACKAGE_RELS_PART = "_rels/.rels"
+_DOCUMENT_PART = "word/document.xml"
+_DOCUMENT_RELS_PART = "word/_rels/document.xml.rels"
+# Rewritten at every checkpoint; the current ones are always the last entries in the zip
+_TAIL_PARTS = (_DOCUMENT_PART, _DOCUMENT_RELS_PART, _CONTENT_TYPES_PART, _PACKAGE_RELS_PART)
+
+# Zip end of central directory record (written without a comment), the last bytes of every checkpoint
+_END_RECORD = b"PK\x05\x06"
+_END_RECORD_SIZE = 22
+
+_MEDIA_PART = re.compile(r"word/media/image(\d+)\.(\w+)$")
+
+_IMAGE_CONTENT_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "jpg": "image/jpeg",
+    "gif": "image/gif",
+    "bmp": "image/bmp",
+    "webp": "image/webp",  # Only for documents written before WebP was embedded as PNG
+}
+# Formats that can be stored on disk but that Word 2016/2019 and python-docx cannot show; embedded as PNG
+_EMBED_AS_PNG = {"webp"}
+
+_CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '{defaults}'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+_PACKAGE_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+_DOCUMENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+    'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<w:body>'
+)
+
+# Letter with 1" margins, the same page python-docx's default template uses
+_DOCUMENT_TAIL = (
+    '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+    '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" '
+    'w:header="720" w:footer="720" w:gutter="0"/></w:sectPr>'
+    '</w:body></w:document>'
+)
+
+_PICTURE_XML = (
+    '<w:p><w:pPr><w:jc w:val="center"/></w:pPr><w:r><w:drawing>'
+    '<wp:inline distT="0" distB="0" distL="0" distR="0">'
+    '<wp:extent cx="{cx}" cy="{cy}"/>'
+    '<wp:docPr id="{id}" name="Picture {id}"/>'
+    '<wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+    '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<pic:pic><pic:nvPicPr><pic:cNvPr id="{id}" name="{name}"/><pic:cNvPicPr/></pic:nvPicPr>'
+    '<pic:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+    '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+    '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr></pic:pic>'
+    '</a:graphicData></a:graphic></wp:inline></w:drawing></w:r></w:p>'
+)
+
+
+def restore_last_checkpoint(path):
+    """Cuts off a checkpoint that was interrupted half-way. Returns True if the document was repaired.
+
+    StreamingDocxWriter only appends, so the last complete checkpoint is still
+    the start of the file; its size and mtime are recorded in the document index.
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(DocumentIndex(path).path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        size, mtime_ns = data["doc_size"], data["doc_mtime_ns"]
+        if not data.get("streaming") or os.path.getsize(path) <= size:
+            return False
+        with open(path, "r+b") as f:
+            f.seek(-_END_RECORD_SIZE, os.SEEK_END)
+            if f.read(4) == _END_RECORD:
+                return False  # The later checkpoint completed; only its index was not saved
+            f.seek(size - _END_RECORD_SIZE)
+            if f.read(4) != _END_RECORD:
+                return False
+            f.truncate(size)
+        os.utime(path, ns=(mtime_ns, mtime_ns))  # So the index matches the document again
+    except (OSError, ValueError, KeyError) as e:
+        logging.error(f"Cannot restore the last checkpoint of {path}: {e}")
+        return False
+    logging.warning(f"Removed an interrupted checkpoint from {path}")
+    return True
+
+
+def _png_copy(image_path):
+    """In-memory PNG of an image Word cannot embed directly."""
+    import io
+    from PIL import Image
+    picture = io.BytesIO()
+    with Image.open(image_path) as img:
+        img.save(picture, "PNG")
+    picture.seek(0)
+    return picture
+
+
+class PythonDocxDocument:
+    """In-memory python-docx document (the original behaviour)."""
+
+    def __init__(self, path, existing=False):
+        from docx import Document
+        self.path = path
+        self.document = Document(path) if existing else Document()
+        self.index = DocumentIndex.load(path) if existing else None
+        if self.index is None:
+            self.index = DocumentIndex(path)
+            if existing:
+                texts = [paragraph.text for paragraph in self.document.paragraphs]
+                self.index.next_number = last_screenshot_number(texts) + 1
+
+    def is_empty(self):
+        return not self.document.paragraphs
+
+    def add_paragraph(self, text="", center=False):
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        paragraph = self.document.add_paragraph(text)
+        if center:
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    def add_picture(self, image_path, width_emu, height_emu, number=None, description="", sha256=None):
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        from docx.shared import Emu
+        picture = image_path
+        if os.path.splitext(image_path)[1].lstrip(".").lower() in _EMBED_AS_PNG:
+            picture = _png_copy(image_path)  # python-docx cannot read WebP headers
+        self.document.add_picture(picture, width=Emu(int(width_emu)), height=Emu(int(height_emu)))
+        self.document.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
+        self.index.add(number, description, image_path, sha256=sha256)
+
+    def add_page_break(self):
+        self.document.add_page_break()
+
+    def checkpoint(self):
+        pass  # Nothing is written until save()
+
+    def save(self):
+        self.document.save(self.path)
+        self.index.save()
+
+
+class StreamingDocxWriter:
+    """Writes a .docx incrementally.
+
+    Paragraphs are appended to a spool file next to the document and images are
+    queued by path. Every checkpoint_every images (and on save) the queued
+    images, the document parts and a new zip directory are appended after the
+    package already on disk. Nothing that was written is ever overwritten, so
+    between checkpoints the file is a complete, openable document as of the last
+    one; an interrupted checkpoint is undone by restore_last_checkpoint().
+    Each checkpoint leaves the previous document parts behind as unused bytes;
+    save() compacts the file when they exceed COMPACT_RATIO of it.
+
+    With existing=True it resumes a document it wrote earlier: only the body XML
+    is read back, and the images already in the package are never rewritten.
+    """
+
+    COMPACT_RATIO = 0.1
+
+    def __init__(self, path, checkpoint_every=10, existing=False, index=None):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.index = index or DocumentIndex(path, streaming=True)
+        self._media = []  # Extensions of word/media/image<N>, in order
+        self._media_by_hash = {}  # sha256 -> media number, so identical images share one part
+        self._drawings = 0
+        self._pending = []  # (image path, part, index entry) of images not in the package yet
+        self._since_checkpoint = 0
+        self._tail_offset = None  # Where the current document parts start; None until the package exists
+        self._changed = not existing
+        self._unused_bytes = 0  # Document parts and directories superseded by later checkpoints
+        self._paragraphs = 0
+        spool_fd, self._spool_path = tempfile.mkstemp(
+            prefix=os.path.basename(path) + ".", suffix=".body", dir=os.path.dirname(path) or None)
+        self._spool = os.fdopen(spool_fd, "w", encoding="utf-8")
+        if existing:
+            self._resume()
+        else:
+            self.checkpoint()
+
+    def _resume(self):
+        with zipfile.ZipFile(self.path) as package:
+            tail_offsets = [package.getinfo(name).header_offset for name in _TAIL_PARTS]
+            media = []
+            for info in package.infolist():
+                match = _MEDIA_PART.match(info.filename)
+                if match:
+                    media.append((int(match.group(1)), match.group(2), info.header_offset))
+            if any(offset > min(tail_offsets) for _, _, offset in media):
+                raise ValueError(f"{self.path} was not written by StreamingDocxWriter")
+            xml = package.read(_DOCUMENT_PART).decode("utf-8")
+        start = xml.index("<w:body>") + len("<w:body>")
+        end = xml.rindex(_DOCUMENT_TAIL)
+        self._spool.write(xml[start:end])
+        self._paragraphs = 1 if end > start else 0
+        self._media = [ext for _, ext, _ in sorted(media)]
+        self._tail_offset = min(tail_offsets)
+        self._drawings = xml.count("<wp:docPr ", start, end)
+        for entry in self.index.entries:
+            match = _MEDIA_PART.match(entry.get("part") or "")
+            if match and entry.get("sha256"):
+                self._media_by_hash.setdefault(entry["sha256"], int(match.group(1)))
+
+    def is_empty(self):
+        return self._paragraphs == 0
+
+    def add_paragraph(self, text="", center=False):
+        props = '<w:pPr><w:jc w:val="center"/></w:pPr>' if center else ""
+        run = f'<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r>' if text else ""
+        self._write_body(f"<w:p>{props}{run}</w:p>")
+
+    def add_picture(self, image_path, width_emu, height_emu, number=None, description="", sha256=None):
+        """The file is read at the next checkpoint and must not change until then.
+
+        sha256 may be passed when the caller already knows the file's hash (image store blobs).
+        """
+        ext = os.path.splitext(image_path)[1].lstrip(".").lower() or "png"
+        if ext in _EMBED_AS_PNG:
+            ext = "png"  # Converted at the checkpoint; the stored file keeps its format
+        elif ext not in _IMAGE_CONTENT_TYPES:
+            raise ValueError(f"Unsupported image type for Word: {ext}")
+        if sha256 is None:
+            sha256 = file_sha256(image_path)
+        else:
+            os.stat(image_path)  # Fail now, while the caller can still note it, rather than at the checkpoint
+        media_number = self._media_by_hash.get(sha256)
+        pending = media_number is None
+        if pending:
+            self._media.append(ext)
+            media_number = len(self._media)
+            self._media_by_hash[sha256] = media_number
+            self._since_checkpoint += 1
+        part = f"word/media/image{media_number}.{self._media[media_number - 1]}"
+        self._drawings += 1
+        self._write_body(_PICTURE_XML.format(cx=int(width_emu), cy=int(height_emu), id=self._drawings,
+                                             name=escape(os.path.basename(image_path), {'"': "&quot;"}),
+                                             rid=f"rIdImg{media_number}"))
+        self.index.add(number, description, image_path, part=part, sha256=sha256)
+        if pending:
+            self._pending.append((image_path, part, self.index.entries[-1]))  # Offset set when written
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def add_page_break(self):
+        self._write_body('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    def _write_body(self, xml):
+        self._spool.write(xml)
+        self._paragraphs += 1
+        self._changed = True
+
+    def _open_package(self):
+        """Opens the package for appending after everything already in it, dropping the old document parts."""
+        if self._tail_offset is None:
+            return zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED)
+        package = zipfile.ZipFile(self.path, "a", compression=zipfile.ZIP_DEFLATED)
+        package.filelist = [info for info in package.filelist if info.filename not in _TAIL_PARTS]
+        for name in _TAIL_PARTS:
+            package.NameToInfo.pop(name, None)
+        # New entries go after the committed directory instead of over it, so that until
+        # this checkpoint completes the start of the file is still the last valid package
+        package.fp.seek(0, os.SEEK_END)
+        package.start_dir = package.fp.tell()
+        self._unused_bytes += package.start_dir - self._tail_offset
+        return package
+
+    def checkpoint(self):
+        """Appends queued images, the document parts and a new zip directory to the file."""
+        if not self._changed:
+            return
+        with span("checkpoint"):
+            self._checkpoint()
+
+    def _checkpoint(self):
+        self._spool.flush()
+        package = self._open_package()
+        for image_path, part, entry in self._pending:
+            try:
+                # Already-compressed image data is stored as-is
+                if os.path.splitext(image_path)[1].lstrip(".").lower() in _EMBED_AS_PNG:
+                    package.writestr(part, _png_copy(image_path).getvalue(), compress_type=zipfile.ZIP_STORED)
+                else:
+                    package.write(image_path, part, compress_type=zipfile.ZIP_STORED)
+            except OSError as e:
+                # The body already refers to this part; an empty one keeps the package valid
+                logging.error(f"Error adding image to Word document: {image_path}: {e}")
+                package.writestr(part, b"")
+            entry["offset"] = package.getinfo(part).header_offset
+        self._pending = []
+        self._tail_offset = package.start_dir
+        with package.open(_DOCUMENT_PART, "w", force_zip64=True) as part, \
+                open(self._spool_path, "rb") as body:
+            part.write(_DOCUMENT_HEAD.encode("utf-8"))
+            while True:
+                chunk = body.read(1 << 20)
+                if not chunk:
+                    break
+                part.write(chunk)
+            part.write(_DOCUMENT_TAIL.encode("utf-8"))
+        rels = "".join(
+            f'<Relationship Id="rIdImg{i}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" '
+            f'Target="media/image{i}.{ext}"/>' for i, ext in enumerate(self._media, 1))
+        package.writestr(_DOCUMENT_RELS_PART,
+                         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                         f'{rels}</Relationships>', compress_type=zipfile.ZIP_DEFLATED)
+        defaults = "".join(f'<Default Extension="{ext}" ContentType="{_IMAGE_CONTENT_TYPES[ext]}"/>'
+                           for ext in sorted(set(self._media)))
+        package.writestr(_CONTENT_TYPES_PART, _CONTENT_TYPES_XML.format(defaults=defaults),
+                         compress_type=zipfile.ZIP_DEFLATED)
+        package.writestr(_PACKAGE_RELS_PART, _PACKAGE_RELS_XML, compress_type=zipfile.ZIP_DEFLATED)
+        package.close()
+        self._since_checkpoint = 0
+        self._changed = False
+        self.index.save()
+        logging.debug(f"Document checkpoint written: {self.path} ({len(self._media)} images)")
+
+    def _compact(self):
+        """Rewrites the package without superseded document parts, then replaces the file in one step."""
+        temp_path = self.path + ".compact"
+        with zipfile.ZipFile(self.path) as source, zipfile.ZipFile(temp_path, "w") as target:
+            for info in source.infolist():
+                with source.open(info) as data, target.open(info, "w", force_zip64=True) as copy:
+                    while True:
+                        chunk = data.read(1 << 20)
+                        if not chunk:
+                            break
+                        copy.write(chunk)
+            offsets = {info.filename: info.header_offset for info in target.infolist()}
+            self._tail_offset = offsets[_DOCUMENT_PART]
+        os.replace(temp_path, self.path)
+        for entry in self.index.entries:
+            if entry.get("part") in offsets:
+                entry["offset"] = offsets[entry["part"]]
+        self.index.save()
+        logging.info(f"Compacted {self.path}, {self._unused_bytes / 1048576:.1f} MB of old checkpoints removed")
+        self._unused_bytes = 0
+
+    def save(self):
+        self.checkpoint()
+        if self._unused_bytes > self.COMPACT_RATIO * os.path.getsize(self.path):
+            with span("compact"):
+                self._compact()
+        self._spool.close()
+        try:
+            os.remove(self._spool_path)
+        except OSError as e:
+            logging.error(f"Error removing document spool file {self._spool_path}: {e}")
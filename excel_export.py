@@ -0,0 +1,104 @@
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from image_encoder import EXCEL_DISPLAY_PX
+from metrics import REGISTRY
+
+EXCEL_COLUMN_WIDTH = 40  # Characters; EXCEL_DISPLAY_PX is this width in pixels
+
+
+def display_height(size):
+    """Height in pixels of an image of the given size shown at the column width."""
+    width, height = size
+    return max(1, round(height * EXCEL_DISPLAY_PX / float(width)))
+
+
+def make_thumbnail(image_path, size, folder, number):
+    """Returns a file holding the image at column width, creating one only if it is wider."""
+    if size is not None and size[0] <= EXCEL_DISPLAY_PX:
+        return image_path, size
+    from PIL import Image
+    with Image.open(image_path) as img:
+        img.draft("RGB", (EXCEL_DISPLAY_PX, EXCEL_DISPLAY_PX * img.height // img.width))  # JPEG only
+        img.thumbnail((EXCEL_DISPLAY_PX, 1 << 16), Image.LANCZOS, reducing_gap=2.0)
+        thumb_path = os.path.join(folder, f"thumb_{number}.png")
+        img.save(thumb_path, "PNG", compress_level=6)
+        return thumb_path, img.size
+
+
+def export_excel(rows, excel_path, progress=None, workers=4):
+    """Writes the Co./Description/Image report for rows to excel_path.
+
+    rows are captured_data entries ({"co", "description", "image_path", "size"}, plus "error"
+    when the image could not be saved).
+    Column-width thumbnails are prepared on a worker pool, once per distinct
+    image file, and the workbook is streamed in openpyxl's write-only mode, so
+    time and memory grow linearly with the number of rows. progress(done, total)
+    is called from this thread.
+    Returns the number of rows whose image could not be added.
+    """
+    import openpyxl
+    from openpyxl.drawing.image import Image as ExcelImage
+
+    start = time.perf_counter()
+    total = len(rows)
+    errors = 0
+    thumb_folder = tempfile.mkdtemp(prefix="excel_thumbs_")
+    try:
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.column_dimensions['C'].width = EXCEL_COLUMN_WIDTH
+        sheet.append(["Co.", "Description", "Image"])  # Header row
+
+        def prepare(item):
+            number, data = item
+            if data.get("error"):
+                return None, data["error"]  # The screenshot itself was never saved
+            try:
+                return make_thumbnail(data["image_path"], data.get("size"), thumb_folder, number), None
+            except Exception as e:
+                return None, e
+
+        def thumbnail_key(item):
+            number, data = item
+            # Rows without an image each carry their own error, so only images are shared
+            return number if data.get("error") or not data["image_path"] else data["image_path"]
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="excel-thumb") as executor:
+            # Rows are written in order while later thumbnails are still being made
+            thumbnails = {}
+            for item in enumerate(rows):
+                if thumbnail_key(item) not in thumbnails:
+                    thumbnails[thumbnail_key(item)] = executor.submit(prepare, item)
+            for row_num, data in enumerate(rows, start=2):
+                thumb, error = thumbnails[thumbnail_key((row_num - 2, data))].result()
+                image_cell = None
+                if thumb is not None:
+                    try:
+                        thumb_path, size = thumb
+                        img = ExcelImage(thumb_path)
+                        img.width, img.height = EXCEL_DISPLAY_PX, display_height(size)
+                        sheet.add_image(img, f"C{row_num}")
+                        sheet.row_dimensions[row_num].height = img.height * 72 / 96  # Approximate conversion
+                    except Exception as e:
+                        error = e
+                if error is not None:
+                    errors += 1
+                    logging.error(f"Error adding image to Excel: {data['image_path']}: {error}")
+                    image_cell = f"Error: {error}"
+                sheet.append([data["co"], data["description"], image_cell])
+                if progress is not None:
+                    progress(row_num - 1, total)
+
+        workbook.save(excel_path)
+    finally:
+        shutil.rmtree(thumb_folder, ignore_errors=True)
+    elapsed = time.perf_counter() - start
+    REGISTRY.observe("generate_excel", elapsed * 1000)
+    REGISTRY.count("excel_rows", total)
+    logging.info(f"Excel export of {total} rows took {elapsed:.2f}s: {excel_path}")
+    return errors
@@ -0,0 +1,109 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+
+class DuplicateDetector:
+    """Compares each frame with the previous frame of the same monitor.
+
+    Frames are linked on the hotkey thread (cheap), and compared on the encode
+    workers, so the pixel work never runs on the hotkey. A small greyscale
+    thumbnail is only a fast check for frames that clearly changed: a few words
+    of text can average out in it, so a frame is only unchanged once the full
+    resolution frames agree. Pixels differing by more than pixel_tolerance in
+    any channel count as changed, and a frame counts as unchanged when the box
+    around them covers at most max_area pixels (cursor-sized noise).
+    """
+
+    KEEP = "keep"  # Detection off
+    SKIP = "skip"  # Drop unchanged frames entirely
+    REFERENCE = "reference"  # Re-use the previous image part in the document
+    CROP = "crop"  # Drop unchanged frames, crop changed ones to the changed area
+
+    PADDING = 8  # Pixels kept around a cropped changed area
+
+    def __init__(self, mode=KEEP, max_area=16, pixel_tolerance=16, thumb_width=160):
+        self.mode = mode
+        self.max_area = max_area
+        self.thumb_width = thumb_width
+        self._table = [255 if level > pixel_tolerance else 0 for level in range(256)]
+        self._last = {}
+        self._lock = threading.Lock()
+        self.counts = {self.SKIP: 0, self.REFERENCE: 0, self.CROP: 0}
+        self.saved_bytes = 0
+
+    @property
+    def enabled(self):
+        return self.mode != self.KEEP
+
+    def link(self, frame, key):
+        """Hotkey thread: chains frame to the previous frame captured for key."""
+        if not self.enabled:
+            return
+        frame.previous = self._last.get(key)
+        frame.thumb = Future()
+        frame.done = Future()
+        self._last[key] = frame
+
+    def _thumbnail(self, image):
+        from PIL import Image
+        width = min(self.thumb_width, image.width)
+        height = max(1, round(image.height * width / float(image.width)))
+        return image.resize((width, height), Image.BOX).convert("L")
+
+    def compare(self, frame, image):
+        """Returns the box (in image coordinates) that changed since the previous frame, or None."""
+        from PIL import ImageChops
+        pixels = image.convert("RGB")
+        thumb = self._thumbnail(pixels)
+        frame.thumb.set_result((thumb, pixels))
+        # Frames are encoded in submission order, so the previous thumbnail is
+        # already being computed and this wait is short
+        previous = frame.previous.thumb.result() if frame.previous is not None else None
+        if previous is None or previous[1].size != pixels.size:
+            return 0, 0, image.width, image.height
+        box = ImageChops.difference(previous[0], thumb).point(self._table).getbbox()
+        if box is not None:
+            # Clearly changed; scale to full resolution with one thumbnail pixel of padding
+            scale_x = image.width / float(thumb.width)
+            scale_y = image.height / float(thumb.height)
+            left, top, right, bottom = box
+            return (max(0, int((left - 1) * scale_x)), max(0, int((top - 1) * scale_y)),
+                    min(image.width, int((right + 1) * scale_x)), min(image.height, int((bottom + 1) * scale_y)))
+        return ImageChops.difference(previous[1], pixels).point(self._table * 3).getbbox()
+
+    def decide(self, frame, image):
+        """Encode worker: returns (action, image) where action is KEEP, SKIP, REFERENCE or CROP."""
+        box = self.compare(frame, image)
+        if frame.previous is not None and (box is None or (box[2] - box[0]) * (box[3] - box[1]) <= self.max_area):
+            return (self.REFERENCE if self.mode == self.REFERENCE else self.SKIP), None
+        if self.mode == self.CROP and box is not None and box != (0, 0, image.width, image.height):
+            box = (max(0, box[0] - self.PADDING), max(0, box[1] - self.PADDING),
+                   min(image.width, box[2] + self.PADDING), min(image.height, box[3] + self.PADDING))
+            area = (box[2] - box[0]) * (box[3] - box[1])
+            if area < image.width * image.height / 2:
+                self.record(self.CROP, (image.width * image.height - area) * len(image.getbands()))
+                return self.CROP, image.crop(box)
+        return self.KEEP, image
+
+    def finish(self, frame, result):
+        """Publishes the encode result (or the one it refers to) to the next frame in the chain."""
+        if frame.thumb is not None and not frame.thumb.done():
+            frame.thumb.set_result(None)
+        if frame.done is not None and not frame.done.done():
+            frame.done.set_result(result)
+        frame.previous = None  # Only the latest frame per monitor stays reachable
+
+    def record(self, action, saved_bytes):
+        with self._lock:
+            self.counts[action] += 1
+            self.saved_bytes += saved_bytes
+
+    def report(self):
+        return (f"Duplicate detection ({self.mode}): skipped {self.counts[self.SKIP]}, "
+                f"referenced {self.counts[self.REFERENCE]}, cropped {self.counts[self.CROP]}, "
+                f"saved about {self.saved_bytes / 1048576:.1f} MB")
+
+    def log_report(self):
+        if self.enabled:
+            logging.info(self.report())
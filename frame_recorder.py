@@ -0,0 +1,142 @@
+import io
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from metrics import count
+from monitor_layout import crop_box, plan_grabs
+
+
+@dataclass
+class RecordedFrame:
+    timestamp: float  # time.monotonic() at grab
+    target: object  # capture_session.CaptureTarget
+    data: bytes  # Compressed image
+    size: tuple
+    extension: str  # ".jpg" or ".png"
+
+
+def compress_frame(image, fmt="jpeg", quality=80, max_width=None):
+    from PIL import Image
+    if max_width and image.width > max_width:
+        image = image.resize((max_width, max(1, round(image.height * max_width / image.width))), Image.BILINEAR,
+                             reducing_gap=2.0)
+    buffer = io.BytesIO()
+    if fmt == "png":
+        image.save(buffer, "PNG", compress_level=1)
+        extension = ".png"
+    else:
+        image.convert("RGB").save(buffer, "JPEG", quality=quality)
+        extension = ".jpg"
+    return buffer.getvalue(), image.size, extension
+
+
+class FrameRecorder:
+    """Grabs targets continuously into a fixed-memory ring buffer of compressed frames.
+
+    A recording thread grabs every 1/fps seconds and hands the pixels to a small
+    compression pool; frames that would exceed max_in_flight are skipped rather
+    than queued, so memory never grows behind a slow encoder. The buffer drops its
+    oldest frames once it holds more than max_bytes or max_seconds of frames.
+    """
+
+    def __init__(self, backend, targets, fps=2.0, max_bytes=256 * 1024 * 1024, max_seconds=60.0,
+                 fmt="jpeg", quality=80, max_width=None, workers=2):
+        self.backend = backend
+        self.targets = targets
+        self.fps = fps
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.fmt = fmt
+        self.quality = quality
+        self.max_width = max_width
+        self.max_in_flight = workers * 2
+        self.skipped = 0
+        self.recorded = 0
+        self._frames = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._in_flight = threading.Semaphore(self.max_in_flight)
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="record-encode")
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="frame-recorder", daemon=True)
+        self._thread.start()
+        logging.info(f"Recording started at {self.fps} fps, buffer {self.max_bytes / 1048576:.0f} MB / "
+                     f"{self.max_seconds:.0f} s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=True)
+        logging.info(f"Recording stopped: {self.recorded} frames recorded, {self.skipped} skipped")
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        rects = [target.rect for target in self.targets]
+        grabs = plan_grabs(rects)
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            if not self._in_flight.acquire(blocking=False):
+                self.skipped += 1  # Encoders are behind; skip this tick instead of queueing pixels
+                count("recording_ticks_skipped")
+            else:
+                timestamp = time.monotonic()
+                try:
+                    shots = [(self.backend.grab(grab_rect), grab_rect, members) for grab_rect, members in grabs]
+                    self._executor.submit(self._compress, timestamp, shots, rects)
+                except Exception as e:
+                    self._in_flight.release()
+                    logging.error(f"Recording grab failed: {e}")
+            # Schedule against a fixed clock so the frame rate does not drift
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()
+            else:
+                self._stop.wait(delay)
+
+    def _compress(self, timestamp, shots, rects):
+        try:
+            frames = []
+            for screenshot, grab_rect, members in shots:
+                for i in members:
+                    image = screenshot if len(members) == 1 else screenshot.crop(crop_box(rects[i], grab_rect))
+                    data, size, extension = compress_frame(image, self.fmt, self.quality, self.max_width)
+                    frames.append(RecordedFrame(timestamp, self.targets[i], data, size, extension))
+            self._append(frames)
+        except Exception as e:
+            logging.error(f"Recording encode failed: {e}")
+        finally:
+            self._in_flight.release()
+
+    def _append(self, frames):
+        with self._lock:
+            for frame in frames:
+                self._frames.append(frame)
+                self._bytes += len(frame.data)
+            self.recorded += 1
+            oldest = time.monotonic() - self.max_seconds
+            while self._frames and (self._bytes > self.max_bytes or self._frames[0].timestamp < oldest):
+                self._bytes -= len(self._frames.popleft().data)
+
+    def last(self, seconds):
+        """Frames from the last seconds seconds, oldest first (safe to call from any thread)."""
+        since = time.monotonic() - seconds
+        with self._lock:
+            frames = [frame for frame in self._frames if frame.timestamp >= since]
+        # Workers may finish slightly out of order
+        frames.sort(key=lambda frame: frame.timestamp)
+        return frames
+
+    def buffered(self):
+        with self._lock:
+            return len(self._frames), self._bytes
@@ -0,0 +1,77 @@
+import os
+import time
+from dataclasses import dataclass
+
+# Display sizes of embedded screenshots: add_to_word uses a 6.5" wide picture,
+# generate_excel a 40-character column (about 285 px at 96 DPI).
+WORD_DISPLAY_INCHES = 6.5
+EXCEL_DISPLAY_PX = 285
+
+FORMATS = {
+    "png": ".png",
+    "jpeg": ".jpg",
+    "webp": ".webp",
+}
+
+
+@dataclass
+class EncodeSettings:
+    format: str = "png"  # "png", "jpeg" or "webp" (lossless)
+    png_compress_level: int = 6
+    jpeg_quality: int = 85
+    downscale: bool = True
+    dpi: int = 150  # Resolution the 6.5" Word picture is rendered at
+    quantize: bool = False  # 256-colour palette, good for flat UI screenshots
+    keep_original: bool = False
+
+
+@dataclass
+class EncodeResult:
+    path: str
+    size: tuple
+    raw_bytes: int
+    encoded_bytes: int
+    encode_ms: float
+    original_path: str = None
+
+    @property
+    def saved_ratio(self):
+        return 1.0 - self.encoded_bytes / float(self.raw_bytes) if self.raw_bytes else 0.0
+
+
+def display_width_px(settings):
+    return int(WORD_DISPLAY_INCHES * settings.dpi)
+
+
+def encode_image(image, path, settings):
+    """Encodes image according to settings, writing it next to path with the format's extension."""
+    from PIL import Image
+    start = time.perf_counter()
+    raw_bytes = image.width * image.height * len(image.getbands())
+    base = os.path.splitext(path)[0]
+
+    original_path = None
+    if settings.keep_original:
+        original_path = f"{base}_original.png"
+        image.save(original_path, "PNG", compress_level=settings.png_compress_level)
+
+    target_width = display_width_px(settings)
+    if settings.downscale and image.width > target_width:
+        target_height = max(1, round(image.height * target_width / image.width))
+        # reducing_gap does a cheap integer box reduction before the Lanczos pass
+        image = image.resize((target_width, target_height), Image.LANCZOS, reducing_gap=2.0)
+
+    fmt = settings.format if settings.format in FORMATS else "png"
+    path = base + FORMATS[fmt]
+    if fmt == "jpeg":
+        image.convert("RGB").save(path, "JPEG", quality=settings.jpeg_quality, optimize=True)
+    else:
+        if settings.quantize and image.mode != "P":
+            image = image.convert("RGB").quantize(colors=256, method=Image.FASTOCTREE)
+        if fmt == "webp":
+            image.save(path, "WEBP", lossless=True, method=4)
+        else:
+            image.save(path, "PNG", compress_level=settings.png_compress_level)
+
+    return EncodeResult(path=path, size=image.size, raw_bytes=raw_bytes, encoded_bytes=os.path.getsize(path),
+                        encode_ms=(time.perf_counter() - start) * 1000, original_path=original_path)
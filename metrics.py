@@ -0,0 +1,168 @@
+"""Process-wide timing and counter metrics, plus non-blocking logging.
+
+Code on the capture path wraps its stages in span("name"); the elapsed
+milliseconds go into a histogram of that name in REGISTRY. The per-capture
+pipeline stages are recorded once, by CapturePipeline, as pipeline_<stage>
+(grab, backpressure, queue, encode, assemble, journal, total). The registry can be
+exported as JSON or as Prometheus text (export_metrics picks by extension).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (milliseconds) of the Prometheus histogram buckets
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def percentile(sorted_samples, fraction):
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+class Histogram:
+    """Exact count, sum and bucket totals, plus a rolling window of samples for percentiles."""
+
+    def __init__(self, max_samples=2048):
+        self.max_samples = max_samples
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+        self._samples = []
+        self._next = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(BUCKETS_MS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        if len(self._samples) < self.max_samples:
+            self._samples.append(value)
+        else:
+            self._samples[self._next] = value  # Ring buffer: overwrite the oldest sample
+            self._next = (self._next + 1) % self.max_samples
+
+    def summary(self):
+        samples = sorted(self._samples)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count,
+            "p50": percentile(samples, 0.50),
+            "p95": percentile(samples, 0.95),
+            "p99": percentile(samples, 0.99),
+            "max": samples[-1],
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def span(self, name):
+        """Times the with-block into the histogram name (milliseconds), even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000.0)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "histograms_ms": {name: histogram.summary() for name, histogram in sorted(self._histograms.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix="screenshot_"):
+        lines = []
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                metric = prefix + _metric_name(name) + "_milliseconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS_MS, histogram.buckets):
+                    cumulative += bucket
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.total:.3f}")
+                lines.append(f"{metric}_count {histogram.count}")
+            for name, value in sorted(self._counters.items()):
+                metric = prefix + _metric_name(name) + "_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """One line per histogram, for the log."""
+        lines = []
+        for name, stats in self.snapshot()["histograms_ms"].items():
+            if stats["count"]:
+                lines.append(f"{name}: n={stats['count']} p50={stats['p50']:.1f}ms p95={stats['p95']:.1f}ms "
+                             f"p99={stats['p99']:.1f}ms max={stats['max']:.1f}ms")
+        return "\n".join(lines)
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+REGISTRY = MetricsRegistry()
+span = REGISTRY.span
+observe = REGISTRY.observe
+count = REGISTRY.count
+
+
+def export_metrics(path, registry=REGISTRY):
+    """Writes the registry to path: Prometheus text for .prom/.txt, JSON otherwise."""
+    text = registry.to_prometheus() if path.lower().endswith((".prom", ".txt")) else registry.to_json()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def setup_logging(filename='screenshot_app.log', level=logging.DEBUG):
+    """Routes logging through a queue so callers never wait on file I/O.
+
+    Records are written to filename by a listener thread, which is flushed and
+    stopped at interpreter exit.
+    """
+    records = queue.SimpleQueue()
+    file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
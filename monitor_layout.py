@@ -0,0 +1,119 @@
+"""Geometry helpers for planning grabs over the virtual desktop.
+
+Rectangles are (x, y, width, height) tuples, matching CaptureBackend regions.
+"""
+from dataclasses import dataclass
+
+
+def union_rect(rects):
+    """Smallest rectangle that contains every rectangle in rects."""
+    left = min(r[0] for r in rects)
+    top = min(r[1] for r in rects)
+    right = max(r[0] + r[2] for r in rects)
+    bottom = max(r[1] + r[3] for r in rects)
+    return left, top, right - left, bottom - top
+
+
+def intersect_rect(a, b):
+    """Overlap of two rectangles, or None if they do not overlap."""
+    left, top = max(a[0], b[0]), max(a[1], b[1])
+    right, bottom = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    if right <= left or bottom <= top:
+        return None
+    return left, top, right - left, bottom - top
+
+
+def coverage(rects):
+    """Fraction of the union rectangle actually covered by rects (monitors never overlap)."""
+    _, _, width, height = union_rect(rects)
+    return sum(r[2] * r[3] for r in rects) / float(width * height)
+
+
+def plan_grabs(rects, min_coverage=0.75):
+    """Groups monitor rectangles into as few grabs as possible.
+
+    Monitors are merged into a shared grab only while the merged rectangle stays
+    at least min_coverage covered, so L-shaped or mixed-resolution layouts do not
+    pay for large dead regions. Returns a list of (grab_rect, [indices into rects]).
+    """
+    groups = [[i] for i in range(len(rects))]
+    while len(groups) > 1:
+        best = None
+        for a in range(len(groups)):
+            for b in range(a + 1, len(groups)):
+                merged = [rects[i] for i in groups[a] + groups[b]]
+                score = coverage(merged)
+                if score >= min_coverage and (best is None or score > best[0]):
+                    best = (score, a, b)
+        if best is None:
+            break
+        _, a, b = best
+        groups[a] = sorted(groups[a] + groups[b])
+        del groups[b]
+    return [(union_rect([rects[i] for i in group]), group) for group in groups]
+
+
+def crop_box(rect, grab_rect):
+    """Box (left, upper, right, lower) of rect inside an image grabbed at grab_rect."""
+    x, y = rect[0] - grab_rect[0], rect[1] - grab_rect[1]
+    return x, y, x + rect[2], y + rect[3]
+
+
+@dataclass(frozen=True)
+class Monitor:
+    geometry: tuple  # As Qt reports it: native top-left, size in device-independent pixels
+    scale: float = 1.0  # devicePixelRatio: physical pixels per device-independent pixel
+
+    @property
+    def rect(self):
+        """The monitor in physical pixels, which is what capture backends grab."""
+        x, y, width, height = self.geometry
+        # Qt keeps a screen's origin in native coordinates and only scales its size
+        return x, y, round(width * self.scale), round(height * self.scale)
+
+
+class MonitorTopology:
+    """Snapshot of the monitor layout, computed once and reused by every capture.
+
+    rects and union are in physical pixels; two snapshots compare equal when
+    no monitor was added, removed, moved, resized or rescaled.
+    """
+
+    def __init__(self, monitors=()):
+        self.monitors = tuple(monitors)
+        self.rects = [monitor.rect for monitor in self.monitors]
+        self.union = union_rect(self.rects) if self.rects else None
+
+    def __len__(self):
+        return len(self.monitors)
+
+    def __eq__(self, other):
+        return isinstance(other, MonitorTopology) and self.monitors == other.monitors
+
+    def clip(self, rect):
+        """rect (physical pixels) limited to the desktop, or None if it is entirely off-screen."""
+        return intersect_rect(rect, self.union) if self.union else None
+
+    def to_physical(self, rect):
+        """Maps a rectangle in Qt's coordinates (e.g. a drag selection) to physical pixels.
+
+        Uses the scale of the monitor containing the rectangle's top-left corner.
+        """
+        x, y, width, height = rect
+        for monitor in self.monitors:
+            left, top, logical_width, logical_height = monitor.geometry
+            if left <= x < left + logical_width and top <= y < top + logical_height:
+                return (left + round((x - left) * monitor.scale), top + round((y - top) * monitor.scale),
+                        round(width * monitor.scale), round(height * monitor.scale))
+        return tuple(rect)
+
+    def label(self, index):
+        _, _, width, height = self.rects[index]
+        scale = self.monitors[index].scale
+        suffix = f" @{scale:g}x" if scale != 1 else ""
+        return f"Monitor {index + 1} ({width}x{height}{suffix})"
+
+    @classmethod
+    def from_screens(cls, screens):
+        """Builds a snapshot from QScreen objects (e.g. QApplication.screens())."""
+        return cls(Monitor(screen.geometry().getRect(), screen.devicePixelRatio()) for screen in screens)
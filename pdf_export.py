@@ -0,0 +1,316 @@
+"""PDF export without Microsoft Word.
+
+The built-in engine reads the captions and images straight out of the .docx
+package and writes a simple PDF (Helvetica text, JPEG images) itself. LibreOffice
+(headless) and Word (docx2pdf) can be used instead when they are installed.
+"""
+import io
+import logging
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import textwrap
+import threading
+import time
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+
+from metrics import REGISTRY
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_R = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+ENGINES = ("auto", "builtin", "libreoffice", "word")
+
+
+def read_docx_entries(docx_path):
+    """Yields ("text", str), ("image", (part, bytes)) and ("page_break", None) in document order.
+
+    An image part used more than once is only read the first time; later uses yield (part, None).
+    """
+    seen = set()
+    with zipfile.ZipFile(docx_path) as package:
+        rels = {}
+        rels_root = ET.fromstring(package.read("word/_rels/document.xml.rels"))
+        for rel in rels_root.iter(f"{_PKG_R}Relationship"):
+            rels[rel.get("Id")] = "word/" + rel.get("Target").lstrip("/").replace("word/", "", 1)
+        with package.open("word/document.xml") as document:
+            for _, element in ET.iterparse(document):
+                if element.tag != f"{_W}p":
+                    continue
+                page_break = any(br.get(f"{_W}type") == "page" for br in element.iter(f"{_W}br"))
+                text = "".join(t.text or "" for t in element.iter(f"{_W}t"))
+                blips = [blip.get(f"{_R}embed") for blip in element.iter(f"{_A}blip")]
+                element.clear()
+                if text or not (blips or page_break):
+                    yield "text", text
+                for rid in blips:
+                    if rid in rels:
+                        part = rels[rid]
+                        yield "image", (part, None if part in seen else package.read(part))
+                        seen.add(part)
+                if page_break:
+                    yield "page_break", None
+
+
+def _pdf_string(text):
+    data = text.encode("cp1252", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class PdfWriter:
+    """Minimal streaming PDF writer: wrapped text lines and JPEG images on Letter pages."""
+
+    PAGE_WIDTH = 612
+    PAGE_HEIGHT = 792
+    MARGIN = 72
+    FONT_SIZE = 11
+    LEADING = 14
+
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self._offsets = {}
+        self._xobjects = {}  # Image key -> (object id, width, height), so repeated images are stored once
+        self._next_id = 4  # 1: catalog, 2: page tree, 3: font
+        self._pages = []
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+                              b"/Encoding /WinAnsiEncoding >>")
+        self._start_page()
+
+    def _alloc(self):
+        self._next_id += 1
+        return self._next_id - 1
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode("ascii") + body)
+        if stream is not None:
+            self._file.write(b"\nstream\n" + stream + b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def _start_page(self):
+        self._ops = []
+        self._images = {}
+        self._y = self.PAGE_HEIGHT - self.MARGIN
+
+    def _finish_page(self):
+        content = zlib.compress("\n".join(self._ops).encode("latin-1"))
+        content_id = self._alloc()
+        self._write_object(content_id, f"<< /Length {len(content)} /Filter /FlateDecode >>".encode("ascii"),
+                           content)
+        xobjects = " ".join(f"/{name} {obj_id} 0 R" for name, obj_id in self._images.items())
+        page_id = self._alloc()
+        self._write_object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.PAGE_WIDTH} {self.PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> /XObject << {xobjects} >> >> "
+            f"/Contents {content_id} 0 R >>").encode("ascii"))
+        self._pages.append(page_id)
+
+    def _page_has_content(self):
+        return bool(self._ops)
+
+    def add_page_break(self):
+        if self._page_has_content():
+            self._finish_page()
+        self._start_page()
+
+    def add_text(self, text):
+        lines = textwrap.wrap(text, width=90) or [""]
+        for line in lines:
+            if self._y - self.LEADING < self.MARGIN:
+                self.add_page_break()
+            self._y -= self.LEADING
+            if line:
+                # The content stream is encoded as latin-1, which round-trips the cp1252 bytes
+                escaped = _pdf_string(line).decode("latin-1")
+                self._ops.append(f"BT /F1 {self.FONT_SIZE} Tf {self.MARGIN} {self._y + 3} Td ({escaped}) Tj ET")
+
+    def add_image(self, image_bytes, key=None):
+        """Draws an image; with a key, image_bytes may be None for a key that was added before."""
+        if key in self._xobjects:
+            image_id, width_px, height_px = self._xobjects[key]
+        else:
+            image_id, width_px, height_px = self._write_image(image_bytes)
+            if key is not None:
+                self._xobjects[key] = (image_id, width_px, height_px)
+
+        content_width = self.PAGE_WIDTH - 2 * self.MARGIN
+        content_height = self.PAGE_HEIGHT - 2 * self.MARGIN
+        width = min(content_width, width_px * 0.75)  # 96 DPI pixels to points
+        height = width * height_px / float(width_px)
+        if height > self._y - self.MARGIN and self._y < self.PAGE_HEIGHT - self.MARGIN:
+            self.add_page_break()
+        if height > content_height:
+            width, height = width * content_height / height, content_height
+        name = f"Im{image_id}"
+        self._images[name] = image_id
+        x = self.MARGIN + (content_width - width) / 2
+        self._y -= height
+        self._ops.append(f"q {width:.2f} 0 0 {height:.2f} {x:.2f} {self._y:.2f} cm /{name} Do Q")
+        self._y -= 6
+
+    def _write_image(self, image_bytes):
+        from PIL import Image
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            if image.format == "JPEG" and image.mode in ("RGB", "L"):
+                data, mode = image_bytes, image.mode
+            else:
+                image = image.convert("RGB")
+                buffer = io.BytesIO()
+                image.save(buffer, "JPEG", quality=90)
+                data, mode = buffer.getvalue(), "RGB"
+            width_px, height_px = image.size
+        image_id = self._alloc()
+        color_space = "/DeviceGray" if mode == "L" else "/DeviceRGB"
+        self._write_object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width_px} /Height {height_px} "
+            f"/ColorSpace {color_space} /BitsPerComponent 8 /Filter /DCTDecode /Length {len(data)} >>"
+        ).encode("ascii"), data)
+        return image_id, width_px, height_px
+
+    def close(self):
+        """Finishes the file and returns the number of pages."""
+        if self._page_has_content() or not self._pages:
+            self._finish_page()
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._pages)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>".encode("ascii"))
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_offset = self._file.tell()
+        self._file.write(f"xref\n0 {self._next_id}\n0000000000 65535 f \n".encode("ascii"))
+        for obj_id in range(1, self._next_id):
+            self._file.write(f"{self._offsets[obj_id]:010d} 00000 n \n".encode("ascii"))
+        self._file.write(f"trailer\n<< /Size {self._next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+                         .encode("ascii"))
+        self._file.close()
+        return len(self._pages)
+
+
+def render_builtin(docx_path, pdf_path):
+    writer = PdfWriter(pdf_path)
+    try:
+        for kind, value in read_docx_entries(docx_path):
+            if kind == "text":
+                writer.add_text(value)
+            elif kind == "image":
+                part, data = value
+                writer.add_image(data, key=part)
+            else:
+                writer.add_page_break()
+    finally:
+        pages = writer.close()
+    return pages
+
+
+def libreoffice_binary():
+    return shutil.which("soffice") or shutil.which("libreoffice")
+
+
+def render_libreoffice(docx_path, pdf_path):
+    with tempfile.TemporaryDirectory() as outdir:
+        subprocess.run([libreoffice_binary(), "--headless", "--convert-to", "pdf", "--outdir", outdir, docx_path],
+                       check=True, capture_output=True, timeout=600)
+        produced = os.path.join(outdir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+        shutil.move(produced, pdf_path)
+    return count_pages(pdf_path)
+
+
+def render_word(docx_path, pdf_path):
+    from docx2pdf import convert
+    convert(docx_path, pdf_path)
+    return count_pages(pdf_path)
+
+
+def count_pages(pdf_path):
+    with open(pdf_path, "rb") as f:
+        return len(re.findall(rb"/Type\s*/Page(?![s\w])", f.read()))
+
+
+def resolve_engine(engine):
+    if engine == "auto":
+        return "libreoffice" if libreoffice_binary() else "builtin"
+    return engine
+
+
+RENDERERS = {"builtin": render_builtin, "libreoffice": render_libreoffice, "word": render_word}
+
+
+@dataclass
+class PdfJob:
+    docx_path: str
+    pdf_path: str = None
+    engine: str = "auto"
+    notify: bool = False  # Show a message box when done (conversions the user asked for directly)
+    seconds: float = 0.0
+    pages: int = 0
+    size: int = 0
+    error: str = ""
+
+    def __post_init__(self):
+        if self.pdf_path is None:
+            self.pdf_path = os.path.splitext(self.docx_path)[0] + ".pdf"
+
+    def summary(self):
+        if self.error:
+            return f"PDF conversion failed for {os.path.basename(self.docx_path)}: {self.error}"
+        return (f"PDF saved: {self.pdf_path} ({self.pages} pages, {self.size / 1048576:.1f} MB, "
+                f"{self.seconds:.1f} s, {self.engine})")
+
+
+def run_job(job):
+    """Converts one job synchronously, filling in its timing, page count, size or error."""
+    start = time.perf_counter()
+    try:
+        job.engine = resolve_engine(job.engine)
+        job.pages = RENDERERS[job.engine](job.docx_path, job.pdf_path)
+        job.size = os.path.getsize(job.pdf_path)
+    except Exception as e:
+        job.error = str(e) or e.__class__.__name__
+    job.seconds = time.perf_counter() - start
+    REGISTRY.observe("pdf", job.seconds * 1000)
+    REGISTRY.count("pdf_failures" if job.error else "pdf_jobs")
+    if job.error:
+        logging.error(job.summary())
+    else:
+        logging.info(job.summary())
+    return job
+
+
+class PdfService:
+    """Converts queued documents one at a time on a background thread.
+
+    on_done(job) is called from the worker thread after every job.
+    """
+
+    def __init__(self, on_done=None):
+        self.on_done = on_done
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="pdf-export", daemon=True)
+                self._thread.start()
+        self._jobs.put(job)
+
+    def submit_batch(self, docx_paths, engine="auto"):
+        for path in docx_paths:
+            self.submit(PdfJob(path, engine=engine))
+
+    def pending(self):
+        return self._jobs.qsize()
+
+    def _run(self):
+        while True:
+            job = run_job(self._jobs.get())
+            if self.on_done is not None:
+                self.on_done(job)
@@ -0,0 +1,53 @@
+import io
+import threading
+from collections import OrderedDict
+
+PREVIEW_SIZE = (300, 200)  # The preview label
+STRIP_SIZE = (96, 64)  # Thumbnails in the capture strip
+
+
+def make_preview(image, size=PREVIEW_SIZE):
+    """Small RGB copy of image fitting in size, made without touching the disk."""
+    from PIL import Image
+    scale = min(size[0] / float(image.width), size[1] / float(image.height), 1.0)
+    target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image.resize(target, Image.BILINEAR, reducing_gap=2.0)
+
+
+def preview_from_bytes(data, size=PREVIEW_SIZE):
+    """Preview of an already-compressed image; JPEGs are decoded at reduced scale."""
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", size)
+        return make_preview(image, size)
+
+
+class PreviewCache:
+    """Strip thumbnails of a session's captures, keyed by capture id, oldest evicted first."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # capture id -> (caption, thumbnail)
+        self._lock = threading.Lock()
+
+    def put(self, capture_id, caption, thumbnail):
+        with self._lock:
+            self._entries[capture_id] = (caption, thumbnail)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, capture_id):
+        with self._lock:
+            return self._entries.get(capture_id)
+
+    def since(self, capture_id):
+        """[(capture id, caption, thumbnail)] for captures newer than capture_id, oldest first."""
+        with self._lock:
+            return [(key, caption, thumbnail) for key, (caption, thumbnail) in self._entries.items()
+                    if key > capture_id]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
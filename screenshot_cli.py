@@ -0,0 +1,264 @@
+"""Headless evidence capture for scripts and test harnesses.
+
+Examples:
+  python screenshot_cli.py capture --folder out --case Login --monitors 1,2 --every 500ms --count 10
+  python screenshot_cli.py capture --folder out --case Login --monitors all --excel --pdf
+  python screenshot_cli.py capture --folder out --case Login --region "Login dialog"   # saved in the GUI
+  python screenshot_cli.py serve --folder out --case Login     # commands on stdin
+  python screenshot_cli.py serve --folder out --case Login --record 5 --record-seconds 20
+  python screenshot_cli.py recover --excel    # rebuild sessions that were never stopped
+  python screenshot_cli.py gc --folder out --keep-days 30    # apply image store retention
+
+In serve mode every stdin line is a command: "capture [description]" takes a
+screenshot, "save [seconds]" adds the last seconds of the --record buffer,
+"stop" (or end of input) saves the documents. Each command is answered with one
+line on stdout; the "Screenshot N captured..." notices, which arrive once a
+capture reaches the document, go to stderr so they never interleave with replies.
+
+No widgets are created; the same .docx/.xlsx/.pdf outputs as the GUI are produced.
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+
+from blob_store import BLOB_FOLDER, BlobStore
+from capture_backends import BACKENDS, SyntheticBackend, select_backend
+from capture_pipeline import CapturePipeline
+from capture_regions import RegionStore, region_target
+from capture_session import (CaptureSession, SessionSettings, all_monitors_target, monitor_targets,
+                             recover_session)
+from frame_dedupe import DuplicateDetector
+from image_encoder import EncodeSettings
+from monitor_layout import intersect_rect, union_rect
+from metrics import REGISTRY, export_metrics, setup_logging
+from pdf_export import ENGINES, PdfJob, run_job
+from session_journal import journal_images, unfinished_journals
+
+
+def parse_interval(text):
+    """'500ms', '2s', '1.5' (seconds) -> seconds."""
+    match = re.fullmatch(r"\s*([0-9.]+)\s*(ms|s)?\s*", text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid interval: {text}")
+    value = float(match.group(1))
+    return value / 1000.0 if match.group(2) == "ms" else value
+
+
+def parse_synthetic_monitors(text):
+    """'1920x1080,1280x1024' -> monitors laid out left to right."""
+    monitors, x = [], 0
+    for size in text.split(","):
+        width, height = (int(v) for v in size.lower().split("x"))
+        monitors.append((x, 0, width, height))
+        x += width
+    return monitors
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--folder", required=True, help="Output folder")
+    common.add_argument("--case", default="Evidence", help="Test case name")
+    common.add_argument("--version", default="v1", help="Document version")
+    common.add_argument("--append", metavar="DOCX", help="Append to an existing Word document")
+    common.add_argument("--monitors", default="1", help="'all', or comma-separated monitor numbers (default: 1)")
+    common.add_argument("--region", metavar="NAME|X,Y,W,H",
+                        help="Capture only a region saved in the GUI, or given in pixels (overrides --monitors)")
+    common.add_argument("--description", default="", help="Screenshot description")
+    common.add_argument("--timestamp", action="store_true", help="Add a timestamp to descriptions")
+    common.add_argument("--increment", type=int, default=1, help="Screenshot number increment (default: 1)")
+    common.add_argument("--backend", choices=sorted(BACKENDS), help="Capture backend (default: fastest)")
+    common.add_argument("--synthetic-monitors", type=parse_synthetic_monitors,
+                        help="Monitor sizes for the synthetic backend, e.g. 1920x1080,1280x1024")
+    common.add_argument("--format", choices=["png", "jpeg", "webp"], default="png")
+    common.add_argument("--no-downscale", action="store_true", help="Embed images at full resolution")
+    common.add_argument("--dpi", type=int, default=150)
+    common.add_argument("--dedupe", choices=[DuplicateDetector.KEEP, DuplicateDetector.SKIP,
+                                             DuplicateDetector.REFERENCE, DuplicateDetector.CROP],
+                        default=DuplicateDetector.KEEP, help="What to do with unchanged screens")
+    common.add_argument("--queue-depth", type=int, default=8)
+    common.add_argument("--drop", action="store_true", help="Drop captures when the queue is full")
+    common.add_argument("--workers", type=int, default=2)
+    common.add_argument("--excel", action="store_true", help="Also write the Excel report")
+    common.add_argument("--pdf", action="store_true", help="Also write a PDF")
+    common.add_argument("--pdf-engine", choices=ENGINES, default="auto")
+    common.add_argument("--delete-images", action="store_true", help="Delete image files after saving")
+    common.add_argument("--no-image-store", action="store_true",
+                        help="Write named image files instead of the content-addressed image store")
+    common.add_argument("--keep-days", type=int,
+                        help="After saving, remove stored images not captured for this many days")
+    common.add_argument("--metrics", metavar="FILE",
+                        help="Write stage timings and counters to FILE (.prom for Prometheus text, else JSON)")
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    capture = commands.add_parser("capture", parents=[common], help="Take a fixed number of screenshots")
+    capture.add_argument("--count", type=int, default=1, help="Number of captures (default: 1)")
+    capture.add_argument("--every", type=parse_interval, default=0.0,
+                         help="Interval between captures, e.g. 500ms or 2s")
+    serve = commands.add_parser("serve", parents=[common], help="Take screenshots on commands read from stdin")
+    serve.add_argument("--record", type=float, metavar="FPS",
+                       help="Record continuously at FPS frames per second for the save command")
+    serve.add_argument("--record-seconds", type=float, default=30.0,
+                       help="Seconds of recording to keep in memory (default: 30)")
+    serve.add_argument("--record-buffer", type=int, default=256, help="Recording memory limit in MB (default: 256)")
+    recover = commands.add_parser("recover", help="Rebuild the documents of sessions that were never stopped")
+    recover.add_argument("--excel", action="store_true", help="Also rebuild the Excel reports")
+    gc = commands.add_parser("gc", help="Remove unused images from a folder's image store")
+    gc.add_argument("--folder", required=True, help="Output folder")
+    gc.add_argument("--keep-days", type=int,
+                    help="Also remove images not captured for this many days (default: keep images in use)")
+    return parser
+
+
+def build_session(args):
+    if args.backend == "synthetic" or (args.backend is None and args.synthetic_monitors):
+        backend = SyntheticBackend(args.synthetic_monitors)
+    else:
+        backend = select_backend(args.backend)
+    settings = SessionSettings(
+        folder=args.folder, case_name=args.case, version=args.version,
+        add_timestamp=args.timestamp, auto_increment=True, increment_by=args.increment,
+        encode=EncodeSettings(format=args.format, downscale=not args.no_downscale, dpi=args.dpi),
+        queue_depth=args.queue_depth,
+        queue_policy=CapturePipeline.DROP if args.drop else CapturePipeline.BLOCK,
+        workers=args.workers, dedupe_mode=args.dedupe, delete_images_after_save=args.delete_images,
+        blob_store=not args.no_image_store, keep_images_days=args.keep_days)
+    # In serve mode stdout carries exactly one reply per command
+    notices = sys.stderr if args.command == "serve" else sys.stdout
+    return CaptureSession(backend, settings,
+                          on_captured=lambda path, message, info: print(message, file=notices, flush=True))
+
+
+def build_targets(args, backend):
+    rects = backend.monitors()
+    if args.region:
+        return [parse_region(args.region, union_rect(rects))], False
+    if args.monitors.strip().lower() == "all":
+        return [all_monitors_target(rects)], False
+    indices = [int(number) - 1 for number in args.monitors.split(",")]
+    targets = monitor_targets(rects, indices)
+    if len(targets) != len(indices):
+        raise SystemExit(f"Unknown monitor in --monitors {args.monitors} ({len(rects)} available)")
+    return targets, len(targets) > 1
+
+
+def parse_region(text, desktop):
+    """Saved region name or 'x,y,w,h' -> CaptureTarget clipped to the desktop."""
+    if re.fullmatch(r"\s*-?\d+\s*(,\s*-?\d+\s*){3}", text):
+        name, rect = "custom", tuple(int(value) for value in text.split(","))
+    else:
+        name, rect = text, RegionStore().get(text)
+        if rect is None:
+            raise SystemExit(f"Unknown region: {text}")
+    clipped = intersect_rect(rect, desktop)
+    if clipped is None:
+        raise SystemExit(f"Region {text} is not on any monitor")
+    return region_target(name, clipped)
+
+
+def run_capture(args, session, targets, new_pages):
+    start = time.perf_counter()
+    for number in range(args.count):
+        if args.every and number:
+            # Schedule against the start time so the interval does not drift
+            delay = start + number * args.every - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if not session.capture(targets, args.description, new_pages=new_pages):
+            print(f"Capture {number + 1} dropped: queue full", flush=True)
+
+
+def run_serve(args, session, targets, new_pages):
+    if args.record:
+        session.start_recording(targets, fps=args.record, seconds=args.record_seconds,
+                                max_megabytes=args.record_buffer)
+    for line in sys.stdin:
+        command, _, rest = line.strip().partition(" ")
+        if command in ("capture", "c"):
+            count = session.screenshot_count
+            ok = session.capture(targets, rest or args.description, new_pages=new_pages)
+            print(f"ok {count}" if ok else f"dropped {count}", flush=True)
+        elif command == "save":
+            count = session.screenshot_count
+            try:
+                seconds = float(rest) if rest else args.record_seconds
+            except ValueError:
+                print(f"error invalid seconds: {rest}", flush=True)
+                continue
+            frames = session.save_recording(seconds, args.description)
+            print(f"ok {count} {frames} frames" if frames else "error nothing recorded", flush=True)
+        elif command in ("stop", "quit", "exit"):
+            break
+        elif command:
+            print(f"error unknown command: {command}", flush=True)
+
+
+def run_recover(args):
+    journals = unfinished_journals()
+    if not journals:
+        print("No unfinished sessions.")
+    failed = 0
+    for journal_path in journals:
+        result = recover_session(journal_path, export_excel=args.excel)
+        print(result.summary(), flush=True)
+        failed += bool(result.error or result.warning)
+    return 1 if failed else 0
+
+
+def run_gc(args):
+    root = os.path.join(args.folder, BLOB_FOLDER)
+    if not os.path.isdir(root):
+        print(f"No image store in {args.folder}")
+        return 0
+    removed, freed = BlobStore(root).collect(args.keep_days, protected=journal_images())
+    print(f"Removed {removed} image(s), freed {freed / 1048576:.1f} MB")
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging('screenshot_app.log', level=logging.DEBUG)
+    if args.command == "recover":
+        return run_recover(args)
+    if args.command == "gc":
+        return run_gc(args)
+
+    session = build_session(args)
+    targets, new_pages = build_targets(args, session.backend)
+    if args.append:
+        session.append(args.append)
+    else:
+        session.start_new()
+
+    try:
+        if args.command == "capture":
+            run_capture(args, session, targets, new_pages)
+        else:
+            run_serve(args, session, targets, new_pages)
+    finally:
+        doc_path = session.stop()
+        session.backend.close()
+    print(f"Word document saved to: {doc_path}", flush=True)
+
+    if args.excel and session.captured_data:
+        errors = session.export_excel()
+        print(f"Excel document saved to: {session.excel_path}" + (f" ({errors} image errors)" if errors else ""))
+    status = 0
+    if args.pdf:
+        job = run_job(PdfJob(doc_path, engine=args.pdf_engine))
+        print(job.summary())
+        status = 1 if job.error else 0
+    if args.delete_images and not status:
+        session.cleanup_captured_images()
+    if args.metrics:
+        export_metrics(args.metrics)
+        print(REGISTRY.report())
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""Append-only journal of a capture session, for recovery after a crash.
+
+Every capture added to the document is also written as one JSON line to
+<document>.journal in the output folder. Lines reach the OS with a single
+os.write() as soon as they are recorded; fsync() is batched on a background
+thread. A pointer to each open journal is kept in REGISTRY_FOLDER so the next
+start-up can find sessions that never reached "End Capture & Save".
+
+While a session runs, its process holds an OS lock on <document>.journal.lock,
+which is released when the process exits or dies. Journals whose lock is still
+held belong to a live session and are never offered for recovery.
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+REGISTRY_FOLDER = os.path.join(os.path.expanduser("~"), ".screenshot_tool", "sessions")
+
+
+def _pointer_path(journal_path):
+    digest = hashlib.sha1(os.path.abspath(journal_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(REGISTRY_FOLDER, f"{digest}.path")
+
+
+def lock_journal(path):
+    """Takes the owner lock of the journal at path. Returns its fd, or None if a live process holds it."""
+    fd = os.open(path + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)  # Per open file, so it also excludes this process
+        return fd
+    except OSError:
+        os.close(fd)
+        return None
+
+
+def unlock_journal(fd):
+    """Releases a lock taken by lock_journal()."""
+    try:
+        if os.name == "nt":
+            import msvcrt
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)  # Closing also releases flock()
+
+
+def journal_in_use(path):
+    """True while the session that writes the journal (or a recovery of it) is running."""
+    if not os.path.exists(path + LOCK_SUFFIX):
+        return False
+    fd = lock_journal(path)
+    if fd is None:
+        return True
+    unlock_journal(fd)
+    return False
+
+
+def _set_aside(path):
+    """Renames an unfinished journal at path to <path>.<start time>, so a new session does not overwrite it.
+
+    The renamed journal stays in the registry and can still be recovered.
+    """
+    try:
+        header, records = read_journal(path)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logging.warning(f"Overwriting unreadable session journal {path}: {e}")
+        return
+    if not records:
+        return  # Nothing was captured, so there is nothing to recover
+    aside = f"{path}.{int(header.get('started', time.time()))}"
+    os.replace(path, aside)
+    os.makedirs(REGISTRY_FOLDER, exist_ok=True)
+    with open(_pointer_path(aside), "w", encoding="utf-8") as f:
+        f.write(os.path.abspath(aside))
+    logging.warning(f"Unfinished session journal {path} ({len(records)} captures) kept as {aside}")
+
+
+class SessionJournal:
+    """Writes one record per capture; fsyncs every sync_every records or sync_interval seconds."""
+
+    def __init__(self, doc_path, header, sync_every=16, sync_interval=1.0):
+        self.path = doc_path + JOURNAL_SUFFIX
+        self._owner_lock = lock_journal(self.path)
+        if self._owner_lock is None:
+            raise OSError(f"{self.path} belongs to a capture session that is still running")
+        _set_aside(self.path)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.records = 0
+        self.syncs = 0
+        self.write_ms = 0.0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+        self._write(dict(header, type="start", started=time.time(), pid=os.getpid(), host=socket.gethostname()))
+        self._sync()
+        os.makedirs(REGISTRY_FOLDER, exist_ok=True)
+        with open(_pointer_path(self.path), "w", encoding="utf-8") as f:
+            f.write(os.path.abspath(self.path))
+        self._thread = threading.Thread(target=self._run, name="session-journal", daemon=True)
+        self._thread.start()
+
+    def _write(self, record):
+        os.write(self._fd, (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+
+    def record(self, **fields):
+        """Appends a capture record. Returns the time it took in milliseconds."""
+        start = time.perf_counter()
+        self._write(dict(fields, type="capture"))
+        with self._lock:
+            self._pending += 1
+            if self._pending >= self.sync_every:
+                self._wake.set()
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        self.records += 1
+        self.write_ms += elapsed_ms
+        return elapsed_ms
+
+    def _sync(self):
+        with self._lock:
+            self._pending = 0
+        os.fsync(self._fd)
+        self.syncs += 1
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            with self._lock:
+                pending = self._pending
+            if pending and not self._closed:
+                self._sync()
+
+    def close(self, finished=True):
+        """Stops the journal; a finished session's journal is deleted."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self._sync()
+        os.close(self._fd)
+        unlock_journal(self._owner_lock)
+        if self.records:
+            logging.info(f"Session journal: {self.records} records, "
+                         f"{self.write_ms / self.records:.3f} ms per capture, {self.syncs} fsyncs")
+        if finished:
+            discard_journal(self.path)
+
+
+def read_journal(path):
+    """Returns (header, capture records). A torn last line from a crash is ignored."""
+    header, records = None, []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logging.warning(f"Ignoring incomplete journal record in {path}")
+                break
+            if record.get("type") == "start":
+                header = record
+            elif record.get("type") == "capture":
+                records.append(record)
+    if header is None:
+        raise ValueError(f"{path} is not a session journal")
+    return header, records
+
+
+def unfinished_journals(include_live=False):
+    """Journals of sessions that were never stopped, oldest first.
+
+    Sessions that are still running are left out unless include_live is set.
+    """
+    journals = []
+    try:
+        pointers = [os.path.join(REGISTRY_FOLDER, name) for name in os.listdir(REGISTRY_FOLDER)]
+    except OSError:
+        return journals
+    for pointer in pointers:
+        try:
+            with open(pointer, "r", encoding="utf-8") as f:
+                path = f.read().strip()
+        except OSError:
+            continue
+        if not os.path.exists(path):
+            os.remove(pointer)  # Journal deleted by hand
+        elif include_live or not journal_in_use(path):
+            journals.append(path)
+    journals.sort(key=os.path.getmtime)
+    return journals
+
+
+def journal_images():
+    """Image paths captured by unfinished sessions, which must survive until they are recovered."""
+    images = set()
+    for journal_path in unfinished_journals(include_live=True):
+        try:
+            images.update(record["image"] for record in read_journal(journal_path)[1])
+        except (OSError, ValueError) as e:
+            logging.error(f"Unreadable session journal {journal_path}: {e}")
+    return images
+
+
+def discard_journal(path):
+    for stale in (path, _pointer_path(path), path + LOCK_SUFFIX):
+        try:
+            os.remove(stale)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Error removing {stale}: {e}")
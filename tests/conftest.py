@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def session_registry(tmp_path, monkeypatch):
+    """Keeps the journals of test sessions out of the user's registry of unfinished sessions."""
+    import session_journal
+    folder = tmp_path / "sessions"
+    monkeypatch.setattr(session_journal, "REGISTRY_FOLDER", str(folder))
+    return folder
@@ -0,0 +1,65 @@
+import os
+import time
+
+from blob_store import GRACE_SECONDS, BlobStore
+
+
+def put(store, tmp_path, data):
+    source = tmp_path / f"{data.decode()}.png"
+    source.write_bytes(data)
+    return store.put_file(str(source))
+
+
+def make_old(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def live_document(tmp_path, name, store, blobs):
+    doc_path = tmp_path / name
+    doc_path.write_bytes(b"document")
+    store.record(str(doc_path), [{"co": i, "description": "", "image_path": blob} for i, blob in enumerate(blobs)])
+    return str(doc_path)
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path / "store"))
+    first, second = put(store, tmp_path, b"same"), put(store, tmp_path, b"same")
+    assert first == second and os.path.exists(first)
+    assert not (tmp_path / "same.png").exists()
+
+
+def test_release_keeps_blobs_other_documents_or_sessions_use(tmp_path):
+    store = BlobStore(str(tmp_path / "store"))
+    shared, own, pending = (put(store, tmp_path, data) for data in (b"shared", b"own", b"pending"))
+    live_document(tmp_path, "other.docx", store, [shared])
+    doc_path = live_document(tmp_path, "report.docx", store, [shared, own, pending])
+
+    assert store.release([shared, own, pending], doc_path=doc_path, protected=[pending]) == 1
+    assert [os.path.exists(path) for path in (shared, own, pending)] == [True, False, True]
+
+
+def test_collect_removes_orphans_after_the_grace_period(tmp_path):
+    store = BlobStore(str(tmp_path / "store"))
+    used, old_orphan, new_orphan, protected = (put(store, tmp_path, data)
+                                               for data in (b"used", b"old", b"new", b"protected"))
+    doc_path = live_document(tmp_path, "report.docx", store, [used])
+    for path in (used, old_orphan, protected):
+        make_old(path, GRACE_SECONDS + 60)
+
+    assert store.collect(protected=[protected])[0] == 1
+    assert [os.path.exists(path) for path in (used, old_orphan, new_orphan, protected)] == [True, False, True, True]
+
+    os.remove(doc_path)  # Blobs of deleted documents become orphans too
+    assert store.collect()[0] == 2
+    assert os.path.exists(new_orphan) and not os.path.exists(used)
+
+
+def test_collect_expires_blobs_not_captured_for_keep_days(tmp_path):
+    store = BlobStore(str(tmp_path / "store"))
+    stale, recent = put(store, tmp_path, b"stale"), put(store, tmp_path, b"recent")
+    live_document(tmp_path, "report.docx", store, [stale, recent])
+    make_old(stale, 3 * 86400)
+
+    assert store.collect(keep_days=2)[0] == 1
+    assert not os.path.exists(stale) and os.path.exists(recent)
@@ -0,0 +1,81 @@
+import sys
+import threading
+import types
+
+import pytest
+
+from capture_backends import BACKENDS, CaptureBackend, MssBackend, SyntheticBackend, select_backend
+
+
+def fake_backend(name, available):
+    return type(f"Fake{name}", (CaptureBackend,), {"name": name, "available": classmethod(lambda cls: available)})
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    """Replaces the real grabbers with fakes whose availability each test sets."""
+    monkeypatch.delenv("SCREENSHOT_BACKEND", raising=False)
+
+    def install(**available):
+        for name, flag in available.items():
+            monkeypatch.setitem(BACKENDS, name, fake_backend(name, flag))
+    return install
+
+
+def test_auto_prefers_mss(backends):
+    backends(mss=True, pyautogui=True)
+    assert select_backend().name == "mss"
+
+
+def test_auto_falls_back_in_order(backends):
+    backends(mss=False, pyautogui=True)
+    assert select_backend().name == "pyautogui"
+    backends(mss=False, pyautogui=False)
+    assert isinstance(select_backend(), SyntheticBackend)
+
+
+def test_environment_overrides_auto_but_not_an_explicit_choice(backends, monkeypatch):
+    backends(mss=True, pyautogui=True)
+    monkeypatch.setenv("SCREENSHOT_BACKEND", "synthetic")
+    assert isinstance(select_backend(), SyntheticBackend)
+    assert select_backend("pyautogui").name == "pyautogui"
+
+
+def test_unknown_backend_is_an_error(backends, monkeypatch):
+    with pytest.raises(ValueError):
+        select_backend("gdi")
+    monkeypatch.setenv("SCREENSHOT_BACKEND", "gdi")
+    with pytest.raises(ValueError):
+        select_backend()
+
+
+def test_synthetic_frames_differ_and_match_the_region():
+    backend = SyntheticBackend([(0, 0, 320, 200)])
+    first, second = backend.grab((0, 0, 320, 200)), backend.grab((10, 10, 64, 48))
+    assert first.size == (320, 200) and second.size == (64, 48)
+    assert first.getpixel((0, 0)) != second.getpixel((0, 0))
+
+
+def test_mss_close_releases_every_threads_handle(monkeypatch):
+    opened = []
+
+    class Handle:
+        monitors = [{}, {"left": 0, "top": 0, "width": 320, "height": 200}]
+        closed = False
+
+        def __init__(self):
+            opened.append(self)
+
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setitem(sys.modules, "mss", types.SimpleNamespace(mss=Handle))
+    backend = MssBackend()
+    backend.monitors()  # GUI thread
+    for _ in range(2):  # Hotkey and recorder threads
+        thread = threading.Thread(target=backend.monitors)
+        thread.start()
+        thread.join()
+    backend.close()
+
+    assert len(opened) == 3 and all(handle.closed for handle in opened)
@@ -0,0 +1,19 @@
+import time
+
+from capture_pipeline import CaptureFrame, CaptureJob, CapturePipeline
+
+
+def test_waiting_for_a_queue_slot_is_recorded_as_backpressure():
+    assembled = []
+    pipeline = CapturePipeline(lambda frame: time.sleep(0.05), assembled.append, queue_depth=1, workers=1)
+    for co in range(1, 4):
+        now = time.perf_counter()
+        pipeline.submit(CaptureJob(co, "burst", [CaptureFrame(None, f"{co}.png", "")],
+                                   hotkey_time=now, grab_time=now))
+    pipeline.shutdown()
+
+    stats = pipeline.latency.summary()
+    assert [job.co for job in assembled] == [1, 2, 3]
+    assert stats["backpressure"]["count"] == 3
+    assert stats["backpressure"]["max"] >= 30  # Later presses waited for the earlier encodes
+    assert stats["grab"]["max"] < 30  # ...which the grab stage alone does not show
@@ -0,0 +1,192 @@
+import json
+import os
+import time
+import zipfile
+
+import pytest
+from docx import Document
+
+from blob_store import BLOB_FOLDER, GRACE_SECONDS, BlobStore
+from capture_backends import SyntheticBackend
+from capture_session import CaptureSession, SessionSettings, monitor_targets
+from document_index import DocumentIndex
+from frame_dedupe import DuplicateDetector
+from image_encoder import EncodeSettings
+
+
+def document_pictures(doc_path):
+    """(pictures in the body, distinct media parts) of a .docx."""
+    with zipfile.ZipFile(doc_path) as package:
+        body = package.read("word/document.xml").decode("utf-8")
+        media = [name for name in package.namelist() if name.startswith("word/media/")]
+    return body.count("<wp:docPr "), len(media)
+
+
+@pytest.mark.parametrize("blob_store", [True, False])
+def test_captures_without_auto_increment_keep_every_picture(tmp_path, blob_store):
+    # Every capture shares one screenshot number and file name, and encodes run in parallel
+    backend = SyntheticBackend()
+    session = CaptureSession(backend, SessionSettings(folder=str(tmp_path), auto_increment=False,
+                                                      blob_store=blob_store, workers=4))
+    session.start_new()
+    targets = monitor_targets(backend.monitors(), [0])
+    for _ in range(12):
+        assert session.capture(targets, "step")
+    doc_path = session.stop()
+
+    assert document_pictures(doc_path) == (12, 12)
+    assert len({capture["image_path"] for capture in session.captured_data}) == 12
+
+
+def test_failed_encode_is_noted_instead_of_dropped(tmp_path, monkeypatch):
+    import capture_session
+
+    def failing_encode(image, path, settings):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(capture_session, "encode_image", failing_encode)
+    backend = SyntheticBackend()
+    messages = []
+    session = CaptureSession(backend, SessionSettings(folder=str(tmp_path)),
+                             on_captured=lambda path, message, info: messages.append(message))
+    session.start_new()
+    session.capture(monitor_targets(backend.monitors(), [0]), "login")
+    doc_path = session.stop()
+
+    with zipfile.ZipFile(doc_path) as package:
+        body = package.read("word/document.xml").decode("utf-8")
+    assert "Screenshot 1 (Monitor 1): login" in body
+    assert "Error saving screenshot image: disk full" in body
+    assert session.captured_data[0]["error"] == "disk full"
+    assert "could not be saved" in messages[-1]
+    assert not list(tmp_path.glob("*.png"))  # The reserved file is not left behind
+
+
+class ScriptedBackend(SyntheticBackend):
+    """Returns a solid colour per grab, in the given order."""
+
+    def __init__(self, colors):
+        super().__init__()
+        self.colors = list(colors)
+
+    def grab(self, region):
+        from PIL import Image
+        return Image.new("RGB", region[2:], self.colors.pop(0))
+
+
+def test_skipped_capture_gives_its_number_back(tmp_path):
+    red, blue, green = (200, 0, 0), (0, 0, 200), (0, 200, 0)
+    backend = ScriptedBackend([red, red, blue, blue, green])
+    session = CaptureSession(backend, SessionSettings(folder=str(tmp_path), auto_increment=True,
+                                                      dedupe_mode=DuplicateDetector.SKIP))
+    session.start_new()
+    targets = monitor_targets(backend.monitors(), [0])
+    for step in ["one", "two", "three", "four", "five"]:
+        session.capture(targets, step)
+    doc_path = session.stop()
+
+    captions = [paragraph.text for paragraph in Document(doc_path).paragraphs if paragraph.text]
+    assert captions == ["Screenshot 1 (Monitor 1): one", "Screenshot 2 (Monitor 1): three",
+                        "Screenshot 3 (Monitor 1): five"]
+    assert [row["co"] for row in session.captured_data] == [1, 2, 3]
+    assert DocumentIndex.load(doc_path).next_number == 4
+
+
+def status_screen(status):
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (1920, 1080), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 1920, 60), fill=(40, 70, 140))
+    draw.text((40, 500), "Order 1042 submitted", fill=(0, 0, 0))
+    draw.text((40, 520), f"Status: {status}", fill=(0, 0, 0))
+    return image
+
+
+class ImageBackend(SyntheticBackend):
+    """Returns the given images, in order."""
+
+    def __init__(self, images):
+        super().__init__([(0, 0, images[0].width, images[0].height)])
+        self.images = list(images)
+
+    def grab(self, region):
+        return self.images.pop(0).copy()
+
+
+def test_small_text_change_is_not_skipped(tmp_path):
+    backend = ImageBackend([status_screen("FAIL"), status_screen("PASS"), status_screen("PASS")])
+    session = CaptureSession(backend, SessionSettings(folder=str(tmp_path), dedupe_mode=DuplicateDetector.SKIP))
+    session.start_new()
+    targets = monitor_targets(backend.monitors(), [0])
+    for step in ["submit", "result", "again"]:
+        session.capture(targets, step)
+    doc_path = session.stop()
+
+    assert [capture["description"] for capture in session.captured_data] == ["submit", "result"]
+    assert document_pictures(doc_path) == (2, 2)
+
+
+class CountingBackend(SyntheticBackend):
+    def __init__(self, monitors):
+        super().__init__(monitors)
+        self.regions = []
+
+    def grab(self, region):
+        self.regions.append(region)
+        return super().grab(region)
+
+
+def test_adjacent_monitors_are_grabbed_once_and_cropped(tmp_path):
+    rects = [(0, 0, 320, 200), (320, 0, 320, 200)]
+    backend = CountingBackend(rects)
+    session = CaptureSession(backend, SessionSettings(folder=str(tmp_path), encode=EncodeSettings(downscale=False)))
+    session.start_new()
+    session.capture(monitor_targets(rects, [0, 1]), "both", new_pages=True)
+    session.stop()
+
+    assert backend.regions == [(0, 0, 640, 200)]
+    assert [capture["size"] for capture in session.captured_data] == [(320, 200), (320, 200)]
+
+
+def test_appending_continues_the_numbering_of_the_document(tmp_path):
+    backend = SyntheticBackend()
+    targets = monitor_targets(backend.monitors(), [0])
+    session = CaptureSession(backend, SessionSettings(folder=str(tmp_path), auto_increment=True))
+    session.start_new()
+    session.capture(targets, "one")
+    session.capture(targets, "two")
+    doc_path = session.stop()
+
+    session = CaptureSession(backend, SessionSettings(folder=str(tmp_path), auto_increment=True))
+    session.append(doc_path)
+    session.capture(targets, "three")
+    session.stop()
+
+    assert document_pictures(doc_path) == (3, 3)
+    captions = [p.text for p in Document(doc_path).paragraphs if p.text.startswith("Screenshot")]
+    assert captions == ["Screenshot 1 (Monitor 1): one", "Screenshot 2 (Monitor 1): two",
+                        "Screenshot 3 (Monitor 1): three"]
+
+
+def test_rerun_of_a_case_releases_the_images_of_the_overwritten_document(tmp_path):
+    backend = SyntheticBackend()  # Every grab has a new colour, so the runs share no images
+    targets = monitor_targets(backend.monitors(), [0])
+    runs = []
+    for _ in range(3):
+        session = CaptureSession(backend, SessionSettings(folder=str(tmp_path)))
+        session.start_new()
+        session.capture(targets, "one")
+        session.capture(targets, "two")
+        session.stop()
+        runs.append({capture["image_path"] for capture in session.captured_data})
+    store = BlobStore(str(tmp_path / BLOB_FOLDER))
+    then = time.time() - GRACE_SECONDS - 60
+    for path, _ in store.blobs():
+        os.utime(path, (then, then))
+
+    assert store.collect()[0] == 4
+    assert not any(os.path.exists(path) for path in runs[0] | runs[1])
+    assert all(os.path.exists(path) for path in runs[2])
+    with open(store.index_path, encoding="utf-8") as f:
+        assert [len(entries) for entries in json.load(f)["documents"].values()] == [2]
+
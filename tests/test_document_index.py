@@ -0,0 +1,41 @@
+import os
+
+from document_index import DocumentIndex, last_screenshot_number
+
+
+def test_last_screenshot_number_skips_paragraphs_without_one():
+    texts = ["Case: Login", "Screenshot 3 (Monitor 1): first", "Screenshot 4 (Monitor 2): second",
+             "Error saving screenshot image: disk full", ""]
+    assert last_screenshot_number(texts) == 4
+    assert last_screenshot_number(["Case: Login"]) == 0
+
+
+def saved_index(tmp_path):
+    doc_path = tmp_path / "report.docx"
+    doc_path.write_bytes(b"document")
+    image_path = tmp_path / "shot.png"
+    image_path.write_bytes(b"image")
+    index = DocumentIndex(str(doc_path))
+    index.add(7, "login", str(image_path))
+    index.save()
+    return doc_path
+
+
+def test_index_is_loaded_while_the_document_is_unchanged(tmp_path):
+    index = DocumentIndex.load(str(saved_index(tmp_path)))
+    assert index.next_number == 8
+    assert [entry["description"] for entry in index.entries] == ["login"]
+
+
+def test_index_is_ignored_once_the_document_is_edited(tmp_path):
+    doc_path = saved_index(tmp_path)
+    with open(doc_path, "ab") as f:
+        f.write(b" edited")
+    assert DocumentIndex.load(str(doc_path)) is None
+
+
+def test_index_is_ignored_when_only_the_modification_time_changed(tmp_path):
+    doc_path = saved_index(tmp_path)
+    stat = os.stat(doc_path)
+    os.utime(doc_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert DocumentIndex.load(str(doc_path)) is None
@@ -0,0 +1,119 @@
+import zipfile
+
+import pytest
+from docx import Document
+from PIL import Image
+
+from document_index import DocumentIndex
+from docx_writer import EMU_PER_INCH, StreamingDocxWriter, restore_last_checkpoint
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"shot_{i}.png"
+        Image.new("RGB", (64, 48), (i * 40, 255 - i * 40, 128)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def add_screenshot(writer, image_path, number):
+    writer.add_paragraph(f"Screenshot {number}: step {number}")
+    writer.add_picture(image_path, 6.5 * EMU_PER_INCH, 4.875 * EMU_PER_INCH, number=number,
+                       description=f"step {number}")
+
+
+def pictures(doc_path):
+    return len(Document(doc_path).inline_shapes)
+
+
+def test_file_is_a_valid_document_between_checkpoints(tmp_path, images):
+    doc_path = str(tmp_path / "evidence.docx")
+    writer = StreamingDocxWriter(doc_path, checkpoint_every=3)
+    for number, image_path in enumerate(images[:5], 1):
+        add_screenshot(writer, image_path, number)
+        assert zipfile.is_zipfile(doc_path)
+        assert pictures(doc_path) == 3 * (number // 3)  # As of the last checkpoint
+    writer.save()
+    assert pictures(doc_path) == 5
+
+
+def test_save_compacts_old_checkpoints_and_keeps_the_index_current(tmp_path, images):
+    doc_path = str(tmp_path / "evidence.docx")
+    writer = StreamingDocxWriter(doc_path, checkpoint_every=1)
+    for number, image_path in enumerate(images, 1):
+        add_screenshot(writer, image_path, number)
+    assert writer._unused_bytes > 0
+    writer.save()
+
+    assert writer._unused_bytes == 0
+    assert pictures(doc_path) == 6
+    index = DocumentIndex.load(doc_path)
+    with zipfile.ZipFile(doc_path) as package:
+        for entry in index.entries:
+            assert package.getinfo(entry["part"]).header_offset == entry["offset"]
+
+
+def write_document(doc_path, images):
+    writer = StreamingDocxWriter(doc_path)
+    for number, image_path in enumerate(images, 1):
+        add_screenshot(writer, image_path, number)
+    writer.save()
+
+
+def resume(doc_path, checkpoint_every=10):
+    return StreamingDocxWriter(doc_path, checkpoint_every=checkpoint_every, existing=True,
+                               index=DocumentIndex.load(doc_path))
+
+
+def test_appending_never_invalidates_the_existing_document(tmp_path, images):
+    doc_path = str(tmp_path / "evidence.docx")
+    write_document(doc_path, images[:3])
+
+    writer = resume(doc_path)
+    add_screenshot(writer, images[3], 4)
+    # Abandoned before its next checkpoint: the original three screenshots are untouched
+    assert pictures(doc_path) == 3
+    assert DocumentIndex.load(doc_path).next_number == 4
+
+    writer = resume(doc_path)
+    add_screenshot(writer, images[3], 4)
+    add_screenshot(writer, images[4], 5)
+    writer.save()
+    assert pictures(doc_path) == 5
+    assert DocumentIndex.load(doc_path).next_number == 6
+
+
+def test_interrupted_checkpoint_is_cut_off(tmp_path, images):
+    doc_path = str(tmp_path / "evidence.docx")
+    write_document(doc_path, images[:3])
+    with open(images[3], "rb") as image, open(doc_path, "ab") as document:
+        # Half of a checkpoint reached the disk
+        document.write(b"PK\x03\x04" + image.read() + bytes(70000))
+    assert not zipfile.is_zipfile(doc_path)
+
+    assert restore_last_checkpoint(doc_path)
+    assert pictures(doc_path) == 3
+    writer = resume(doc_path)  # The index matches the restored file again
+    add_screenshot(writer, images[3], 4)
+    writer.save()
+    assert pictures(doc_path) == 4
+    assert not restore_last_checkpoint(doc_path)
+
+
+def test_webp_images_are_embedded_as_png(tmp_path):
+    image_path = str(tmp_path / "shot.webp")
+    Image.new("RGB", (64, 48), (0, 128, 255)).save(image_path, "WEBP", lossless=True)
+    doc_path = str(tmp_path / "evidence.docx")
+    writer = StreamingDocxWriter(doc_path)
+    add_screenshot(writer, image_path, 1)
+    writer.save()
+
+    with zipfile.ZipFile(doc_path) as package:
+        media = [name for name in package.namelist() if name.startswith("word/media/")]
+        assert media == ["word/media/image1.png"]
+        assert package.read(media[0]).startswith(b"\x89PNG")
+        assert "image/webp" not in package.read("[Content_Types].xml").decode("utf-8")
+    assert pictures(doc_path) == 1
+
@@ -0,0 +1,22 @@
+import openpyxl
+from PIL import Image
+
+from excel_export import export_excel
+
+
+def test_each_failed_row_shows_its_own_error(tmp_path):
+    image_path = tmp_path / "shot.png"
+    Image.new("RGB", (64, 48), (0, 0, 200)).save(image_path)
+    rows = [
+        {"co": 1, "description": "first", "image_path": None, "size": None, "error": "boom1"},
+        {"co": 2, "description": "saved", "image_path": str(image_path), "size": (64, 48)},
+        {"co": 3, "description": "second", "image_path": None, "size": None, "error": "boom2"},
+        {"co": 4, "description": "saved again", "image_path": str(image_path), "size": (64, 48)},
+    ]
+    excel_path = str(tmp_path / "report.xlsx")
+
+    assert export_excel(rows, excel_path) == 2
+    sheet = openpyxl.load_workbook(excel_path).active
+    assert [row[2] for row in sheet.iter_rows(min_row=2, values_only=True)] == \
+        ["Error: boom1", None, "Error: boom2", None]
+    assert len(sheet._images) == 2
@@ -0,0 +1,26 @@
+from monitor_layout import Monitor, MonitorTopology, crop_box, plan_grabs
+
+
+def test_side_by_side_monitors_share_one_grab():
+    rects = [(0, 0, 1920, 1080), (1920, 0, 1920, 1080)]
+    assert plan_grabs(rects) == [((0, 0, 3840, 1080), [0, 1])]
+
+
+def test_layouts_with_large_dead_regions_are_grabbed_separately():
+    # A portrait monitor beside a much shorter one leaves most of the union uncovered
+    rects = [(0, 0, 1080, 1920), (1080, 0, 3840, 400)]
+    assert plan_grabs(rects) == [(rects[0], [0]), (rects[1], [1])]
+
+
+def test_crop_box_places_each_monitor_inside_the_shared_grab():
+    grab_rect = (-1920, 0, 3840, 1080)  # A monitor left of the primary has negative coordinates
+    assert crop_box((-1920, 0, 1920, 1080), grab_rect) == (0, 0, 1920, 1080)
+    assert crop_box((0, 0, 1920, 1080), grab_rect) == (1920, 0, 3840, 1080)
+
+
+def test_topology_works_in_physical_pixels():
+    topology = MonitorTopology([Monitor((0, 0, 1920, 1080)), Monitor((1920, 0, 1280, 720), scale=1.5)])
+    assert topology.rects == [(0, 0, 1920, 1080), (1920, 0, 1920, 1080)]
+    assert topology.to_physical((1920 + 100, 100, 200, 100)) == (1920 + 150, 150, 300, 150)
+    assert topology.clip((3700, 1000, 400, 400)) == (3700, 1000, 140, 80)
+    assert topology.clip((5000, 0, 10, 10)) is None
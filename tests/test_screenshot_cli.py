@@ -0,0 +1,16 @@
+import io
+
+import screenshot_cli
+
+
+def test_serve_answers_each_command_with_one_line(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.stdin", io.StringIO("capture one\ncapture two\nbogus\nstop\n"))
+
+    assert screenshot_cli.main(["serve", "--folder", str(tmp_path), "--case", "Login",
+                                "--synthetic-monitors", "320x200"]) == 0
+
+    out, err = capsys.readouterr()
+    assert out.splitlines()[:3] == ["ok 1", "ok 2", "error unknown command: bogus"]
+    assert out.splitlines()[3].startswith("Word document saved to: ")
+    assert "Screenshot 2 captured" in err and "captured" not in out
@@ -0,0 +1,116 @@
+import zipfile
+
+import pytest
+
+from capture_backends import SyntheticBackend
+from capture_session import CaptureSession, SessionSettings, monitor_targets, recover_session
+from session_journal import SessionJournal, journal_images, read_journal, unfinished_journals
+
+
+def start_journal(tmp_path, name="report.docx"):
+    return SessionJournal(str(tmp_path / name), {"doc_path": str(tmp_path / name)})
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    journal = start_journal(tmp_path)
+    journal.record(co=1, image="first.png")
+    journal.record(co=2, image="second.png")
+    journal.close(finished=False)
+    with open(journal.path, "rb+") as f:
+        f.truncate(f.seek(0, 2) - 5)  # The crash cut the last record short
+
+    header, records = read_journal(journal.path)
+    assert header["doc_path"] == str(tmp_path / "report.docx")
+    assert [record["co"] for record in records] == [1]
+
+
+def test_running_session_is_not_offered_for_recovery(tmp_path):
+    journal = start_journal(tmp_path)
+    try:
+        assert unfinished_journals() == []
+        assert unfinished_journals(include_live=True) == [journal.path]
+        assert recover_session(journal.path).error  # Refused while the owner holds the lock
+    finally:
+        journal.close(finished=False)
+
+
+def test_session_that_stopped_running_is_offered_for_recovery(tmp_path):
+    journal = start_journal(tmp_path)
+    journal.record(image=str(tmp_path / "shot.png"))
+    journal.close(finished=False)  # The lock goes away with the owner, as on a crash
+
+    assert unfinished_journals() == [journal.path]
+    assert journal_images() == {str(tmp_path / "shot.png")}
+
+
+def test_live_session_images_stay_protected(tmp_path):
+    journal = start_journal(tmp_path)
+    try:
+        journal.record(image=str(tmp_path / "shot.png"))
+        assert journal_images() == {str(tmp_path / "shot.png")}
+    finally:
+        journal.close(finished=False)
+
+
+def test_a_second_session_cannot_take_over_a_running_journal(tmp_path):
+    journal = start_journal(tmp_path)
+    try:
+        with pytest.raises(OSError):
+            start_journal(tmp_path)
+    finally:
+        journal.close(finished=False)
+
+
+def test_recovery_warns_when_the_original_document_is_lost(tmp_path):
+    backend = SyntheticBackend()
+    targets = monitor_targets(backend.monitors(), [0])
+    first = CaptureSession(backend, SessionSettings(folder=str(tmp_path), journal=False))
+    first.start_new()
+    first.capture(targets, "before")
+    doc_path = first.stop()
+
+    session = CaptureSession(backend, SessionSettings(folder=str(tmp_path)))
+    session.append(doc_path)
+    session.capture(targets, "after")
+    session.pipeline.flush()
+    session.journal.close(finished=False)  # The application dies here
+    with open(doc_path, "wb") as f:
+        f.write(b"not a document")
+
+    result = recover_session(unfinished_journals()[0], export_excel=False)
+
+    assert not result.error
+    assert result.doc_path.endswith("_recovered.docx")
+    assert "could not be opened" in result.warning and "lost" in result.summary()
+    with zipfile.ZipFile(result.doc_path) as package:
+        assert "after" in package.read("word/document.xml").decode("utf-8")
+    assert unfinished_journals() == []
+
+
+def test_new_session_for_the_same_document_keeps_the_unfinished_journal(tmp_path):
+    backend = SyntheticBackend()
+    targets = monitor_targets(backend.monitors(), [0])
+    crashed = CaptureSession(backend, SessionSettings(folder=str(tmp_path)))
+    crashed.start_new()
+    for step in ["one", "two", "three"]:
+        crashed.capture(targets, step)
+    crashed.pipeline.flush()
+    crashed.journal.close(finished=False)  # The application dies here
+
+    # The user declines recovery for now and starts over with the same case and version
+    session = CaptureSession(backend, SessionSettings(folder=str(tmp_path)))
+    session.start_new()
+    session.capture(targets, "new")
+    session.stop()
+
+    journals = unfinished_journals()
+    assert len(journals) == 1 and journals[0] != crashed.journal.path
+    assert len(read_journal(journals[0])[1]) == 3
+    assert {capture["image_path"] for capture in crashed.captured_data} <= journal_images()
+
+    result = recover_session(journals[0], export_excel=False)
+    assert not result.error and result.captures == 3
+    assert result.doc_path != session.doc_path
+    with zipfile.ZipFile(session.doc_path) as package:
+        assert "new" in package.read("word/document.xml").decode("utf-8")
+